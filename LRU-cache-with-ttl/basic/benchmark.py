@@ -0,0 +1,480 @@
+import argparse
+import csv
+import itertools
+import json
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any
+
+from answer import (
+    LRUCache,
+    SegmentedLRUCache,
+    ShardedLRUCache,
+    TieredLRUCache,
+    TinyLFU,
+)
+
+
+class GlobalLockLRUCache:
+    # Baseline: one LRUCache behind a single lock, as callers wrap it today.
+    def __init__(self, capacity: int, ttl_seconds: float):
+        self._cache = LRUCache(capacity, ttl_seconds)
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            return self._cache.get(key)
+
+    def put(self, key: Any, item: Any):
+        with self._lock:
+            self._cache.put(key, item)
+
+
+def _run_threads(cache, threads: int, ops_per_thread: int, keyspace: int) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        keys = [rng.randrange(keyspace) for _ in range(ops_per_thread)]
+        barrier.wait()
+        for key in keys:
+            if cache.get(key) is None:
+                cache.put(key, key)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start
+
+
+def bench_threads(args):
+    print(f"{'threads':>8} {'global ops/s':>14} {'sharded ops/s':>14} {'speedup':>8}")
+    for threads in args.threads:
+        results = []
+        for cache in (
+            GlobalLockLRUCache(args.capacity, 60),
+            ShardedLRUCache(args.capacity, 60, shards=args.shards),
+        ):
+            elapsed = _run_threads(cache, threads, args.ops, args.keyspace)
+            results.append(threads * args.ops / elapsed)
+        print(
+            f"{threads:>8} {results[0]:>14,.0f} {results[1]:>14,.0f}"
+            f" {results[1] / results[0]:>7.2f}x"
+        )
+
+
+def _bytes_per_entry(entries: int, compact: bool) -> float:
+    # Keys are ints below 2**30 and every value is the same object, so what
+    # remains is the cache's own per-entry overhead.
+    keys = list(range(entries))
+    value = object()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    cache = LRUCache(entries, 3600, compact=compact)
+    for key in keys:
+        cache.put(key, value)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert cache.size == entries
+    return (after - before) / entries
+
+
+def bench_memory(args):
+    default = _bytes_per_entry(args.entries, compact=False)
+    compact = _bytes_per_entry(args.entries, compact=True)
+    print(f"{'layout':>8} {'bytes/entry':>12} {'total MiB':>10}")
+    for name, per_entry in (("default", default), ("compact", compact)):
+        total = per_entry * args.entries / 2**20
+        print(f"{name:>8} {per_entry:>12.1f} {total:>10.1f}")
+    print(f"compact uses {default / compact:.2f}x less memory per entry")
+
+
+def bench_batch(args):
+    rng = random.Random(0)
+    cache = LRUCache(args.capacity, 3600)
+    cache.put_many({i: i for i in range(args.capacity)})
+    print(
+        f"{'batch':>6} {'loop get':>12} {'get_many':>12}"
+        f" {'loop put':>12} {'put_many':>12}"
+    )
+    for size in args.sizes:
+        batches = [
+            [rng.randrange(args.keyspace) for _ in range(size)]
+            for _ in range(args.rounds)
+        ]
+        items = [{key: key for key in keys} for keys in batches]
+
+        start = time.perf_counter()
+        for keys in batches:
+            for key in keys:
+                cache.get(key)
+        loop_get = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for keys in batches:
+            cache.get_many(keys)
+        many_get = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for batch in items:
+            for key, value in batch.items():
+                cache.put(key, value)
+        loop_put = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for batch in items:
+            cache.put_many(batch)
+        many_put = time.perf_counter() - start
+
+        ops = size * args.rounds / 1e6
+        print(
+            f"{size:>6} {ops / loop_get:>9.2f} M/s {ops / many_get:>9.2f} M/s"
+            f" {ops / loop_put:>9.2f} M/s {ops / many_put:>9.2f} M/s"
+        )
+
+
+def bench_weighted(args):
+    # Pareto-distributed sizes between 100 bytes and 5 MB: most entries are
+    # small, a few are huge, so one insert can evict many entries at once.
+    # A flat ns/put as the insert count grows shows O(1) amortized eviction.
+    rng = random.Random(0)
+    sizes = [
+        min(5_000_000, int(100 * rng.paretovariate(0.8)))
+        for _ in range(max(args.inserts))
+    ]
+    print(f"{'inserts':>10} {'ns/put':>8} {'evict/put':>10}")
+    for ops in args.inserts:
+        cache = LRUCache(
+            ops,
+            3600,
+            record_stats=True,
+            weigher=lambda key, size: size,
+            max_weight=args.max_weight,
+        )
+        start = time.perf_counter()
+        for key in range(ops):
+            cache.put(key, sizes[key])
+        elapsed = time.perf_counter() - start
+        evictions = cache.stats().evictions
+        print(f"{ops:>10} {elapsed / ops * 1e9:>8.0f} {evictions / ops:>10.3f}")
+
+
+def zipf_trace(length: int, keyspace: int, alpha: float, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    weights = [1 / (rank**alpha) for rank in range(1, keyspace + 1)]
+    cum_weights = list(itertools.accumulate(weights))
+    return rng.choices(range(keyspace), cum_weights=cum_weights, k=length)
+
+
+def scan_trace(start: int, length: int) -> list:
+    # Keys outside the Zipf keyspace, each touched exactly once.
+    return list(range(start, start + length))
+
+
+def loop_trace(length: int, keyspace: int) -> list:
+    # Cycles through the keyspace in order: the LRU worst case once the
+    # keyspace is larger than the cache.
+    return [i % keyspace for i in range(length)]
+
+
+def mixed_scan_trace(length: int, keyspace: int, alpha: float) -> list:
+    # Zipf traffic with one cold scan of `keyspace` keys in the middle.
+    half = length // 2
+    return (
+        zipf_trace(half, keyspace, alpha, seed=1)
+        + scan_trace(keyspace, keyspace)
+        + zipf_trace(length - half, keyspace, alpha, seed=2)
+    )
+
+
+def csv_trace(path: str) -> list:
+    # One request per row; the first column is the key. Blank rows, rows
+    # starting with "#" and a "key" header row are skipped.
+    with open(path, newline="") as f:
+        return [
+            row[0]
+            for row in csv.reader(f)
+            if row and not row[0].startswith("#") and row[0] != "key"
+        ]
+
+
+def replay(cache, trace) -> int:
+    hits = 0
+    for key in trace:
+        if cache.get(key) is None:
+            cache.put(key, key)
+        else:
+            hits += 1
+    return hits
+
+
+POLICIES = {
+    "lru": lambda capacity: LRUCache(capacity, 3600),
+    "clock": lambda capacity: LRUCache(capacity, 3600, lazy_promotion=True),
+    "lru+tinylfu": lambda capacity: LRUCache(
+        capacity, 3600, admission=TinyLFU(capacity)
+    ),
+    "slru": lambda capacity: SegmentedLRUCache(capacity, 3600),
+    "slru+tinylfu": lambda capacity: SegmentedLRUCache(
+        capacity, 3600, admission=TinyLFU(capacity)
+    ),
+}
+
+
+def bench_policies(args):
+    # Steady Zipf traffic, then a one-off scan of `scan` cold keys (the nightly
+    # batch job), then Zipf traffic again. "after scan" is the hit ratio of
+    # the first `recovery` requests following the scan.
+    warmup = zipf_trace(args.requests, args.keyspace, args.alpha, seed=1)
+    scan = scan_trace(args.keyspace, args.scan)
+    after = zipf_trace(args.requests, args.keyspace, args.alpha, seed=2)
+    recovery = after[: args.recovery]
+
+    print(f"{'policy':>14} {'before scan':>12} {'after scan':>11} {'overall':>8}")
+    for name, factory in POLICIES.items():
+        cache = factory(args.capacity)
+        before = replay(cache, warmup) / len(warmup)
+        replay(cache, scan)
+        recovered = replay(cache, recovery) / len(recovery)
+        rest = replay(cache, after[args.recovery :])
+        total = len(warmup) + len(scan) + len(after)
+        overall = (before * len(warmup) + recovered * len(recovery) + rest) / total
+        print(f"{name:>14} {before:>12.1%} {recovered:>11.1%} {overall:>8.1%}")
+
+
+class SimulatedClock:
+    # Trace time: advanced by a fixed step per request, so TTLs expire the
+    # same way on every run regardless of how fast the machine replays.
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _peak_alloc_kib(trace: list, capacity: int, ttl: float, rate: float) -> int:
+    # A separate untimed replay under tracemalloc: its peak belongs to this
+    # run alone, unlike ru_maxrss, and tracing does not skew the latencies.
+    clock = SimulatedClock()
+    step = 1 / rate
+    tracemalloc.start()
+    cache = LRUCache(capacity, ttl, clock=clock)
+    for key in trace:
+        clock.now += step
+        if cache.get(key) is None:
+            cache.put(key, key)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak // 1024
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run_trace(trace: list, capacity: int, ttl: float, rate: float) -> dict:
+    clock = SimulatedClock()
+    cache = LRUCache(capacity, ttl, clock=clock)
+    step = 1 / rate
+    latencies = []
+    hits = 0
+    now_ns = time.perf_counter_ns
+    start = time.perf_counter()
+    for key in trace:
+        clock.now += step
+        t0 = now_ns()
+        if cache.get(key) is None:
+            cache.put(key, key)
+        else:
+            hits += 1
+        latencies.append(now_ns() - t0)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "capacity": capacity,
+        "ttl": ttl,
+        "requests": n,
+        "hit_ratio": hits / n,
+        "ops_per_sec": n / elapsed,
+        "p50_ns": latencies[(n - 1) // 2],
+        "p99_ns": latencies[int((n - 1) * 0.99)],
+        "peak_alloc_kib": _peak_alloc_kib(trace, capacity, ttl, rate),
+    }
+
+
+def bench_traces(args):
+    traces = {}
+    for name in args.traces:
+        if name == "zipf":
+            traces[name] = zipf_trace(args.length, args.keyspace, args.alpha)
+        elif name == "scan":
+            traces[name] = mixed_scan_trace(args.length, args.keyspace, args.alpha)
+        elif name == "loop":
+            traces[name] = loop_trace(args.length, args.keyspace)
+    for path in args.csv:
+        traces[path] = csv_trace(path)
+
+    results = []
+    print(
+        f"{'trace':>10} {'capacity':>9} {'ttl':>7} {'hit ratio':>9} {'ops/s':>10}"
+        f" {'p50 ns':>7} {'p99 ns':>7} {'peak MiB':>9}"
+    )
+    for name, trace in traces.items():
+        for capacity in args.capacities:
+            for ttl in args.ttls:
+                result = {"trace": name, **run_trace(trace, capacity, ttl, args.rate)}
+                results.append(result)
+                print(
+                    f"{name:>10} {capacity:>9} {ttl:>7g} {result['hit_ratio']:>9.1%}"
+                    f" {result['ops_per_sec']:>10,.0f} {result['p50_ns']:>7}"
+                    f" {result['p99_ns']:>7} {result['peak_alloc_kib'] / 1024:>9.1f}"
+                )
+
+    if args.json:
+        report = {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "rate": args.rate,
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def bench_tiered(args):
+    # Zipf reads through a small memory tier. Misses load a value of
+    # `--value-size` bytes and put it, so the disk tier fills with demotions.
+    trace = zipf_trace(args.requests, args.keyspace, args.alpha)
+    value = b"x" * args.value_size
+    latencies: dict[str, list[int]] = {"memory": [], "disk": [], "miss": []}
+    now_ns = time.perf_counter_ns
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TieredLRUCache(
+            args.capacity,
+            3600,
+            f"{tmp}/tier.log",
+            max_disk_bytes=args.disk_mb << 20,
+        )
+        for key in trace:
+            disk_hits, misses = cache.disk_hits, cache.misses
+            t0 = now_ns()
+            if cache.get(key) is None:
+                cache.put(key, value)
+            elapsed = now_ns() - t0
+            if cache.misses != misses:
+                latencies["miss"].append(elapsed)
+            elif cache.disk_hits != disk_hits:
+                latencies["disk"].append(elapsed)
+            else:
+                latencies["memory"].append(elapsed)
+        disk = cache.disk
+        print(
+            f"disk tier: {disk.size} entries, {disk.file_bytes >> 20} MiB file, "
+            f"{disk.compactions} compactions"
+        )
+        cache.close()
+
+    memory_only = LRUCache(args.capacity, 3600)
+    baseline = replay(memory_only, trace) / len(trace)
+    print(f"memory-only LRUCache hit ratio: {baseline:.1%}")
+    print(f"{'tier':>8} {'share':>7} {'p50 us':>8} {'p99 us':>8}")
+    for tier, samples in latencies.items():
+        if not samples:
+            continue
+        samples.sort()
+        n = len(samples)
+        p50 = samples[(n - 1) // 2] / 1000
+        p99 = samples[int((n - 1) * 0.99)] / 1000
+        print(f"{tier:>8} {n / len(trace):>7.1%} {p50:>8.1f} {p99:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LRUCache benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    threads = sub.add_parser("threads", help="throughput as thread count grows")
+    threads.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    threads.add_argument("--ops", type=int, default=50_000, help="ops per thread")
+    threads.add_argument("--capacity", type=int, default=10_000)
+    threads.add_argument("--keyspace", type=int, default=20_000)
+    threads.add_argument("--shards", type=int, default=16)
+    threads.set_defaults(func=bench_threads)
+
+    memory = sub.add_parser("memory", help="per-entry memory, default vs compact")
+    memory.add_argument("--entries", type=int, default=1_000_000)
+    memory.set_defaults(func=bench_memory)
+
+    batch = sub.add_parser("batch", help="get_many/put_many vs per-key loops")
+    batch.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 500])
+    batch.add_argument("--rounds", type=int, default=2_000)
+    batch.add_argument("--capacity", type=int, default=100_000)
+    batch.add_argument("--keyspace", type=int, default=150_000)
+    batch.set_defaults(func=bench_batch)
+
+    weighted = sub.add_parser("weighted", help="weighted eviction, skewed sizes")
+    weighted.add_argument(
+        "--inserts", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    weighted.add_argument("--max-weight", type=int, default=256 * 2**20)
+    weighted.set_defaults(func=bench_weighted)
+
+    policies = sub.add_parser("policies", help="hit ratio under a scan, by policy")
+    policies.add_argument("--capacity", type=int, default=10_000)
+    policies.add_argument("--keyspace", type=int, default=100_000)
+    policies.add_argument("--alpha", type=float, default=1.0)
+    policies.add_argument("--requests", type=int, default=500_000)
+    policies.add_argument("--scan", type=int, default=200_000)
+    policies.add_argument("--recovery", type=int, default=20_000)
+    policies.set_defaults(func=bench_policies)
+
+    traces = sub.add_parser("traces", help="replay access traces, report metrics")
+    traces.add_argument(
+        "--traces",
+        nargs="*",
+        choices=["zipf", "scan", "loop"],
+        default=["zipf", "scan", "loop"],
+    )
+    traces.add_argument("--csv", nargs="*", default=[], help="CSV trace files")
+    traces.add_argument("--capacities", type=int, nargs="+", default=[1_000, 10_000])
+    traces.add_argument("--ttls", type=float, nargs="+", default=[60, 3600])
+    traces.add_argument("--length", type=int, default=200_000)
+    traces.add_argument("--keyspace", type=int, default=50_000)
+    traces.add_argument("--alpha", type=float, default=1.0)
+    traces.add_argument(
+        "--rate", type=float, default=1_000, help="simulated requests per second"
+    )
+    traces.add_argument("--json", help="write machine-readable results here")
+    traces.set_defaults(func=bench_traces)
+
+    tiered = sub.add_parser("tiered", help="hit ratio and latency per cache tier")
+    tiered.add_argument("--capacity", type=int, default=5_000)
+    tiered.add_argument("--disk-mb", type=int, default=64)
+    tiered.add_argument("--value-size", type=int, default=1024)
+    tiered.add_argument("--keyspace", type=int, default=100_000)
+    tiered.add_argument("--alpha", type=float, default=0.9)
+    tiered.add_argument("--requests", type=int, default=200_000)
+    tiered.set_defaults(func=bench_tiered)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
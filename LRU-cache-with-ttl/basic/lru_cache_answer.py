@@ -1,12 +1,45 @@
+import asyncio
+import copy
+import functools
+import heapq
+import itertools
+import mmap
+import os
+import pickle
+import tempfile
+import threading
 import time
-from dataclasses import dataclass
-from typing import Any
+import zlib
+from array import array
+from collections import namedtuple
+from collections.abc import Awaitable, Callable, Iterable, Iterator, Mapping
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, replace
+from multiprocessing import shared_memory
+from typing import Any, Self
+
+_MISSING = object()
+
+# Snapshot files start with this magic string and a format version byte.
+_SNAPSHOT_MAGIC = b"LRUC\x01"
+
+# Reasons passed to an on_evict callback.
+EVICTED = "evicted"
+EXPIRED = "expired"
+
+# Expiry modes: SLIDING restarts the TTL on every hit, ABSOLUTE counts it from
+# the last write only.
+SLIDING = "sliding"
+ABSOLUTE = "absolute"
 
 
 @dataclass
 class CacheItem:
     value: Any
     expiry_time: float
+    ttl_seconds: float
+    weight: float = 1
 
 
 class CacheNode:
@@ -15,20 +48,255 @@ class CacheNode:
         self.item = item
         self.prev: CacheNode | None = None
         self.next: CacheNode | None = None
+        # [expiry_time, seq, node] entry in the owning cache's expiry heap.
+        self.expiry_entry: list | None = None
+        # Reference bit set by reads in lazy promotion mode.
+        self.referenced = False
+
+
+class CompactCacheNode:
+    # One __slots__ object per entry: the CacheItem fields are folded into the
+    # node, and `item` returns the node itself so LRUCache code reads
+    # `node.item.value` the same way for both layouts. This removes two of the
+    # per-entry objects only; the dict slot, the expiry float and the expiry
+    # heap entry are shared costs, so the saving is about 1.4x, not several
+    # times (see benchmark.py memory).
+    __slots__ = (
+        "expiry_entry",
+        "expiry_time",
+        "key",
+        "next",
+        "prev",
+        "referenced",
+        "ttl_seconds",
+        "value",
+        "weight",
+    )
+
+    def __init__(
+        self,
+        key: Any,
+        value: Any,
+        expiry_time: float,
+        ttl_seconds: float,
+        weight: float = 1,
+    ):
+        self.key = key
+        self.value = value
+        self.expiry_time = expiry_time
+        self.ttl_seconds = ttl_seconds
+        self.weight = weight
+        self.prev: CompactCacheNode | None = None
+        self.next: CompactCacheNode | None = None
+        self.expiry_entry: list | None = None
+        self.referenced = False
+
+    @property
+    def item(self) -> "CompactCacheNode":
+        return self
+
+
+def _make_node(
+    key: Any, value: Any, expiry_time: float, ttl_seconds: float, weight: float = 1
+):
+    return CacheNode(key, CacheItem(value, expiry_time, ttl_seconds, weight))
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    # Expired entries found by get/put on that key.
+    expired_on_read: int = 0
+    # Expired entries reclaimed by purges and sweeps.
+    expired_on_purge: int = 0
+    # Live entries removed to make room.
+    evictions: int = 0
+    inserts: int = 0
+
+
+class CoarseClock:
+    # Serves a cached reading of `source` so cache operations do not hit the
+    # system clock each time. Advance it with tick() once per batch, or start()
+    # a background thread that ticks at a fixed interval.
+    def __init__(self, source: Callable[[], float] = time.monotonic):
+        self._source = source
+        self._now = source()
+        self._stop = threading.Event()
+        self._ticker: threading.Thread | None = None
+
+    def __call__(self) -> float:
+        return self._now
+
+    def tick(self) -> float:
+        self._now = self._source()
+        return self._now
+
+    def start(self, interval: float):
+        if interval <= 0:
+            raise ValueError("Interval must be positive")
+        if self._ticker is not None:
+            return
+        self._stop.clear()
+        self._ticker = threading.Thread(
+            target=self._run, args=(interval,), name="coarse-clock", daemon=True
+        )
+        self._ticker.start()
+
+    def stop(self):
+        if self._ticker is None:
+            return
+        self._stop.set()
+        self._ticker.join()
+        self._ticker = None
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            self.tick()
+
+
+class CountMinSketch:
+    # `depth` rows of `width` saturating one-byte counters. A key's estimate is
+    # the minimum over its row counters, so collisions can only overestimate.
+    MAX_COUNT = 15
+    _HALVE = bytes(count >> 1 for count in range(256))
+
+    def __init__(self, width: int, depth: int = 4):
+        if width <= 0 or depth <= 0:
+            raise ValueError("Width and depth must be positive")
+        self.width = width
+        self.depth = depth
+        self._rows = [bytearray(width) for _ in range(depth)]
+
+    def _indexes(self, key: Any) -> Iterable[int]:
+        # Double hashing: derive every row index from one hash() call. The step
+        # comes from a multiplicative mix of the hash, since small ints hash to
+        # themselves and `h1 >> 16` would give them all the same step.
+        h1 = hash(key)
+        h2 = ((h1 * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32 | 1
+        for row in range(self.depth):
+            yield (h1 + row * h2) % self.width
+
+    def increment(self, key: Any):
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+
+    def estimate(self, key: Any) -> int:
+        rows = zip(self._rows, self._indexes(key))
+        return min(row[index] for row, index in rows)
+
+    def halve(self):
+        for row in self._rows:
+            row[:] = row.translate(self._HALVE)
+
+
+class TinyLFU:
+    # Admission filter: a new key may only replace the eviction victim if it
+    # has been seen more often recently. Counters are halved every
+    # `sample_factor * capacity` accesses so old popularity fades out.
+    def __init__(self, capacity: int, sample_factor: int = 10):
+        self.sketch = CountMinSketch(max(64, 8 * capacity))
+        self.sample_size = sample_factor * max(16, capacity)
+        self._samples = 0
+        # Keys read but not written since. Bounded by the sample size; a read
+        # older than that is not matched to a later write.
+        self._unwritten: set = set()
+
+    def _count(self, key: Any):
+        self.sketch.increment(key)
+        self._samples += 1
+        if self._samples >= self.sample_size:
+            self.sketch.halve()
+            self._samples //= 2
+
+    def record(self, key: Any):
+        # One read access.
+        self._count(key)
+        if len(self._unwritten) >= self.sample_size:
+            self._unwritten.clear()
+        self._unwritten.add(key)
+
+    def record_write(self, key: Any):
+        # A put after a read of the same key (read-through on a miss) is part
+        # of that access, which was already counted. Counting it again would
+        # give one-off scan keys a frequency of 2 and age the sketch twice as
+        # fast.
+        if key in self._unwritten:
+            self._unwritten.discard(key)
+        else:
+            self._count(key)
+
+    def admit(self, candidate: Any, victim: Any) -> bool:
+        return self.sketch.estimate(candidate) > self.sketch.estimate(victim)
 
 
 class LRUCache:
-    def __init__(self, capacity: int, ttl_seconds: float):
+    def __init__(
+        self,
+        capacity: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+        sweep_per_op: int = 0,
+        compact: bool = False,
+        record_stats: bool = False,
+        on_evict: Callable[[Any, Any, str], None] | None = None,
+        weigher: Callable[[Any, Any], float] | None = None,
+        max_weight: float | None = None,
+        admission: TinyLFU | None = None,
+        lazy_promotion: bool = False,
+        expiry_mode: str = SLIDING,
+        key_prefix: Callable[[Any], Any] | None = None,
+    ):
         if capacity < 0:
             raise ValueError("Capacity cannot be negative")
         if ttl_seconds < 0:
             raise ValueError("TTL cannot be negative")
+        if expiry_mode not in (SLIDING, ABSOLUTE):
+            raise ValueError(f"Unknown expiry mode: {expiry_mode!r}")
+        if sweep_per_op < 0:
+            raise ValueError("Sweep budget cannot be negative")
+        if (weigher is None) != (max_weight is None):
+            raise ValueError("weigher and max_weight must be given together")
+        if max_weight is not None and max_weight < 0:
+            raise ValueError("Max weight cannot be negative")
 
         self.capacity = capacity
         self.ttl_seconds = ttl_seconds
+        # Monotonic by default: wall-clock jumps must not expire or revive items.
+        self.clock = clock
         self.cache: dict[Any, CacheNode] = {}
         self.head: CacheNode | None = None
         self.tail: CacheNode | None = None
+        self._make_node = CompactCacheNode if compact else _make_node
+        # Incremental sweep: every get/put reclaims from up to `sweep_per_op`
+        # entries of the expiry heap.
+        self.sweep_per_op = sweep_per_op
+        # Min-heap of [expiry_time, seq, node] with lazy updates: refreshing an
+        # item does not touch the heap, and deleted nodes only null their entry.
+        self._expiry_heap: list[list] = []
+        self._expiry_seq = itertools.count()
+        # When disabled, instrumentation costs one None check per hook.
+        self._stats = CacheStats() if record_stats else None
+        self._on_evict = on_evict
+        # Weighted mode: entries are also bounded by the sum of their weights.
+        # Without a weigher every entry weighs 1 and only `capacity` applies.
+        self.weigher = weigher
+        self.max_weight = max_weight
+        self.total_weight: float = 0
+        # Optional admission policy consulted before evicting for a new key.
+        self.admission = admission
+        # CLOCK-style approximate LRU: a hit only sets the node's reference bit
+        # and the list is reordered at eviction time, giving referenced tail
+        # entries a second chance. Writes still move entries to the front.
+        self.lazy_promotion = lazy_promotion
+        # Absolute expiry leaves the item untouched on reads.
+        self.expiry_mode = expiry_mode
+        self._sliding = expiry_mode == SLIDING
+        # Prefix index: key_prefix(key) -> keys, e.g. one group per tenant, so
+        # invalidate_prefix() only touches the matching entries.
+        self.key_prefix = key_prefix
+        self._prefixes: dict[Any, set] | None = {} if key_prefix else None
 
     def _add_to_front(self, node: CacheNode):
         if not self.head:
@@ -62,65 +330,1638 @@ class LRUCache:
         self._remove_node(node)
         self._add_to_front(node)
 
-    def _is_expired(self, node: CacheNode) -> bool:
-        return time.time() >= node.item.expiry_time
+    def _splice_to_front(self, nodes: list[CacheNode]):
+        # `nodes` are unlinked and ordered least to most recent. Chain them
+        # together and attach the chain ahead of the current head in one step.
+        if not nodes:
+            return
+        prev = None
+        for node in reversed(nodes):
+            node.prev = prev
+            if prev:
+                prev.next = node
+            prev = node
+        last = nodes[0]
+        last.next = self.head
+        if self.head:
+            self.head.prev = last
+        else:
+            self.tail = last
+        self.head = nodes[-1]
+
+    def _is_expired(self, node: CacheNode, now: float) -> bool:
+        return now >= node.item.expiry_time
+
+    def _refresh_expiry(self, node: CacheNode, now: float):
+        expiry_time = now + node.item.ttl_seconds
+        node.item.expiry_time = expiry_time
+        # A later expiry is picked up lazily when the old entry surfaces; an
+        # earlier one (a shorter TTL on update) needs a new heap entry.
+        if node.expiry_entry is None or expiry_time < node.expiry_entry[0]:
+            self._schedule_expiry(node)
+
+    def _schedule_expiry(self, node: CacheNode):
+        if node.expiry_entry is not None:
+            node.expiry_entry[2] = None
+        entry = [node.item.expiry_time, next(self._expiry_seq), node]
+        node.expiry_entry = entry
+        heapq.heappush(self._expiry_heap, entry)
+        # Rebuild once dead entries outnumber live ones: O(1) amortized.
+        if len(self._expiry_heap) > 2 * len(self.cache) + 16:
+            self._rebuild_expiry_heap()
+
+    def _rebuild_expiry_heap(self):
+        # In place: _purge_expired may be holding a reference to the list.
+        self._expiry_heap[:] = [e for e in self._expiry_heap if e[2] is not None]
+        heapq.heapify(self._expiry_heap)
 
-    def _refresh_expiry(self, node: CacheNode):
-        node.item.expiry_time = time.time() + self.ttl_seconds
+    def _index(self, node: CacheNode):
+        self.cache[node.key] = node
+        if self._prefixes is not None:
+            prefix = self.key_prefix(node.key)
+            self._prefixes.setdefault(prefix, set()).add(node.key)
+
+    def _delete(self, node: CacheNode):
+        self._remove_node(node)
+        del self.cache[node.key]
+        if self._prefixes is not None:
+            prefix = self.key_prefix(node.key)
+            keys = self._prefixes[prefix]
+            keys.discard(node.key)
+            if not keys:
+                del self._prefixes[prefix]
+        self.total_weight -= node.item.weight
+        if node.expiry_entry is not None:
+            node.expiry_entry[2] = None
+            node.expiry_entry = None
+
+    def _drop(self, node: CacheNode, reason: str):
+        self._delete(node)
+        if self._on_evict is not None:
+            self._on_evict(node.key, node.item.value, reason)
+
+    def _victim(self) -> CacheNode | None:
+        # In lazy mode, referenced tail entries move to the front with their
+        # bit cleared. Each bit is cleared once per read that set it, so this
+        # is O(1) amortized.
+        tail = self.tail
+        while tail and tail.referenced:
+            tail.referenced = False
+            self._move_to_front(tail)
+            tail = self.tail
+        return tail
 
     def _evict_lru(self):
-        if self.tail:
-            lru = self.tail
-            self._remove_node(lru)
-            del self.cache[lru.key]
-
-    def _ensure_capacity(self):
-        # First, remove all expired items from the tail
-        while self.tail and self._is_expired(self.tail):
-            lru = self.tail
-            self._remove_node(lru)
-            del self.cache[lru.key]
+        victim = self._victim()
+        if victim:
+            if self._stats is not None:
+                self._stats.evictions += 1
+            self._drop(victim, EVICTED)
+
+    def _expire_on_read(self, node: CacheNode):
+        if self._stats is not None:
+            self._stats.expired_on_read += 1
+        self._drop(node, EXPIRED)
+
+    def _ensure_capacity(self, now: float, weight: float = 1):
+        # First, remove all expired items, wherever they sit in the list
+        self._purge_expired(now, None)
 
         # Then, if still at capacity, evict one non-expired LRU item
         if len(self.cache) >= self.capacity and self.capacity > 0:
             self._evict_lru()
 
-    def get(self, key: Any) -> Any:
+        # In weighted mode, keep evicting until the new entry fits. Each entry
+        # is evicted at most once, so this is O(1) amortized per insert.
+        if self.max_weight is not None:
+            while self.tail and self.total_weight + weight > self.max_weight:
+                self._evict_lru()
+
+    def _weigh(self, key: Any, item: Any) -> float:
+        if self.weigher is None:
+            return 1
+        weight = self.weigher(key, item)
+        if weight < 0:
+            raise ValueError("Weight cannot be negative")
+        return weight
+
+    def _admit(self, key: Any, now: float) -> bool:
+        self._purge_expired(now, None)
+        if len(self.cache) < self.capacity or not self.tail:
+            return True
+        return self.admission.admit(key, self._victim().key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        stats = self._stats
+        if self.admission is not None:
+            self.admission.record(key)
         node = self.cache.get(key)
         if not node:
-            return None
+            if stats is not None:
+                stats.misses += 1
+            return default
 
-        if self._is_expired(node):
-            self._remove_node(node)
-            del self.cache[key]
-            return None
+        now = self.clock()
+        if self._is_expired(node, now):
+            self._expire_on_read(node)
+            if stats is not None:
+                stats.misses += 1
+            return default
 
-        self._refresh_expiry(node)
-        self._move_to_front(node)
+        if self._sliding:
+            self._refresh_expiry(node, now)
+        if self.lazy_promotion:
+            node.referenced = True
+        else:
+            self._move_to_front(node)
+        if self.sweep_per_op:
+            self._purge_expired(now, self.sweep_per_op)
+        if stats is not None:
+            stats.hits += 1
         return node.item.value
 
-    def put(self, key: Any, item: Any):
+    def peek(self, key: Any, default: Any = None) -> Any:
+        # Read without side effects: no TTL refresh, no reordering, no stats,
+        # and expired entries are left for the next get/put or purge.
+        node = self.cache.get(key)
+        if not node or self._is_expired(node, self.clock()):
+            return default
+        return node.item.value
+
+    def put(self, key: Any, item: Any, ttl: float | None = None):
+        if ttl is None:
+            ttl = self.ttl_seconds
+        elif ttl < 0:
+            raise ValueError("TTL cannot be negative")
+
+        weight = self._weigh(key, item)
+        if self.admission is not None:
+            self.admission.record_write(key)
+        now = self.clock()
         existing = self.cache.get(key)
         if existing:
-            if self._is_expired(existing):
-                self._remove_node(existing)
-                del self.cache[key]
+            if self._is_expired(existing, now):
+                self._expire_on_read(existing)
+            elif self.max_weight is not None and weight > self.max_weight:
+                # The new value can never fit, so the stale one goes too.
+                self._drop(existing, EVICTED)
+                return
             else:
                 existing.item.value = item
-                self._refresh_expiry(existing)
+                existing.item.ttl_seconds = ttl
+                self.total_weight += weight - existing.item.weight
+                existing.item.weight = weight
+                self._refresh_expiry(existing, now)
                 self._move_to_front(existing)
+                if self.max_weight is not None:
+                    while self.total_weight > self.max_weight:
+                        self._evict_lru()
                 return
 
         if self.capacity == 0:
             return
+        if self.max_weight is not None and weight > self.max_weight:
+            return
+        if self.admission is not None and not self._admit(key, now):
+            return
+
+        self._ensure_capacity(now, weight)
 
-        self._ensure_capacity()
+        node = self._make_node(key, item, now + ttl, ttl, weight)
+        self.total_weight += weight
+        self._index(node)
+        self._add_to_front(node)
+        self._schedule_expiry(node)
+        if self._stats is not None:
+            self._stats.inserts += 1
+        if self.sweep_per_op:
+            self._purge_expired(now, self.sweep_per_op)
 
-        expiry_time = time.time() + self.ttl_seconds
-        node = CacheNode(key, CacheItem(item, expiry_time))
-        self.cache[key] = node
+    def _adopt(self, node: CacheNode, now: float):
+        # Link a node detached from another LRUCache, keeping its TTL and
+        # expiry. Used to move entries between SegmentedLRUCache segments.
+        self._ensure_capacity(now, node.item.weight)
+        self._index(node)
+        self.total_weight += node.item.weight
         self._add_to_front(node)
+        self._schedule_expiry(node)
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        node = self.cache.get(key)
+        if not node:
+            return default
+        self._delete(node)
+        if self._is_expired(node, self.clock()):
+            return default
+        return node.item.value
+
+    def get_many(self, keys: Iterable[Any]) -> dict[Any, Any]:
+        # Returns only the hits. Hits are promoted as if fetched one by one in
+        # `keys` order, but with one clock read and one splice for the batch.
+        now = self.clock()
+        touched: dict[Any, CacheNode] = {}
+        misses = 0
+        for key in keys:
+            if self.admission is not None:
+                self.admission.record(key)
+            node = self.cache.get(key)
+            if not node:
+                misses += 1
+                continue
+            if key in touched:
+                # Repeated key: only its last position counts for recency.
+                del touched[key]
+            elif self._is_expired(node, now):
+                self._expire_on_read(node)
+                misses += 1
+                continue
+            else:
+                if self._sliding:
+                    self._refresh_expiry(node, now)
+                if self.lazy_promotion:
+                    node.referenced = True
+                else:
+                    self._remove_node(node)
+            touched[key] = node
+
+        nodes = list(touched.values())
+        if not self.lazy_promotion:
+            self._splice_to_front(nodes)
+        if self.sweep_per_op:
+            self._purge_expired(now, self.sweep_per_op)
+        if self._stats is not None:
+            self._stats.misses += misses
+            self._stats.hits += len(nodes)
+        return {node.key: node.item.value for node in nodes}
+
+    def put_many(self, items: Mapping[Any, Any], ttl: float | None = None):
+        # Equivalent to put() for each item in order, with one clock read, one
+        # expiry purge and one eviction pass for the whole batch.
+        if ttl is None:
+            ttl = self.ttl_seconds
+        elif ttl < 0:
+            raise ValueError("TTL cannot be negative")
+        if self.capacity == 0:
+            return
+        if self.weigher is not None or self.admission is not None or ttl == 0:
+            # Which items fit depends on every weight or admission decision in
+            # the batch; keep exact put() semantics rather than batching. With
+            # ttl=0 each item is already expired and is purged by the next
+            # put(), so a batch must not evict live entries to hold them.
+            for key, item in items.items():
+                self.put(key, item, ttl)
+            return
+
+        now = self.clock()
+        batch = list(items.items())
+        # Earlier items would be evicted by later ones before the batch ends.
+        for key, _ in batch[: -self.capacity]:
+            existing = self.cache.get(key)
+            if existing:
+                if self._stats is not None:
+                    self._stats.evictions += 1
+                self._drop(existing, EVICTED)
+        batch = batch[-self.capacity :]
+
+        nodes = []
+        new_nodes = []
+        for key, item in batch:
+            existing = self.cache.get(key)
+            if existing and self._is_expired(existing, now):
+                self._expire_on_read(existing)
+                existing = None
+            if existing:
+                existing.item.value = item
+                existing.item.ttl_seconds = ttl
+                self._refresh_expiry(existing, now)
+                self._remove_node(existing)
+                nodes.append(existing)
+            else:
+                node = self._make_node(key, item, now + ttl, ttl)
+                nodes.append(node)
+                new_nodes.append(node)
+
+        # Batch nodes are unlinked now, so eviction only touches older entries.
+        # Their expiry is after `now`, so the purge cannot reach them.
+        if new_nodes:
+            self._purge_expired(now, None)
+            while self.tail and len(self.cache) + len(new_nodes) > self.capacity:
+                self._evict_lru()
+
+        self._splice_to_front(nodes)
+        for node in new_nodes:
+            self._index(node)
+            self._schedule_expiry(node)
+        self.total_weight += len(new_nodes)
+        if self._stats is not None:
+            self._stats.inserts += len(new_nodes)
+        if self.sweep_per_op:
+            self._purge_expired(now, self.sweep_per_op)
+
+    def _purge_expired(self, now: float, max_items: int | None) -> int:
+        heap = self._expiry_heap
+        removed = 0
+        examined = 0
+        while heap and heap[0][0] <= now:
+            if max_items is not None and examined >= max_items:
+                break
+            examined += 1
+            _, _, node = heapq.heappop(heap)
+            if node is None:
+                continue
+            node.expiry_entry = None
+            if self._is_expired(node, now):
+                self._drop(node, EXPIRED)
+                removed += 1
+            else:
+                # Refreshed since it was scheduled; requeue at its new expiry.
+                self._schedule_expiry(node)
+        if removed and self._stats is not None:
+            self._stats.expired_on_purge += removed
+        return removed
+
+    def purge_expired(self, max_items: int | None = None) -> int:
+        """Remove expired entries anywhere in the cache, examining at most
+        `max_items` heap entries (all due ones when None). Returns the number
+        removed."""
+        return self._purge_expired(self.clock(), max_items)
+
+    def dump(self, path: str | os.PathLike) -> int:
+        # Write live entries, most recent first, with their remaining TTL.
+        # Columns are pickled as whole lists (TTLs as float arrays) so load()
+        # parses the file in C rather than entry by entry. Keys and values
+        # must be picklable. Returns the number of entries written.
+        now = self.clock()
+        keys = []
+        values = []
+        remaining = array("d")
+        ttls = array("d")
+        node = self.head
+        while node:
+            left = node.item.expiry_time - now
+            if left > 0:
+                keys.append(node.key)
+                values.append(node.item.value)
+                remaining.append(left)
+                ttls.append(node.item.ttl_seconds)
+            node = node.next
+
+        # The clock may be monotonic, which does not carry across processes,
+        # so the time spent on disk is measured with the wall clock.
+        snapshot = (time.time(), keys, values, remaining, ttls)
+        tmp_path = f"{os.fspath(path)}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_SNAPSHOT_MAGIC)
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return len(keys)
+
+    def load(self, path: str | os.PathLike) -> int:
+        # Restore a dump() file, skipping entries that expired in the
+        # meantime. Returns the number of entries loaded.
+        # The snapshot is unpickled, which can run arbitrary code: only load
+        # files this service wrote itself, kept where other users cannot
+        # write, never a shared or world-writable location.
+        with open(path, "rb") as f:
+            if f.read(len(_SNAPSHOT_MAGIC)) != _SNAPSHOT_MAGIC:
+                raise ValueError("Not an LRUCache snapshot")
+            dumped_at, keys, values, remaining, ttls = pickle.load(f)
+
+        elapsed = max(0.0, time.time() - dumped_at)
+        entries = [
+            (key, value, left - elapsed, ttl)
+            for key, value, left, ttl in zip(keys, values, remaining, ttls)
+            if left > elapsed
+        ]
+        if (
+            self.cache
+            or self.weigher is not None
+            or self.admission is not None
+            or self._prefixes is not None
+        ):
+            return self._load_slow(entries)
+
+        # Fast path into an empty cache: build the nodes, splice them in as
+        # one chain and heapify the expiry index once.
+        now = self.clock()
+        nodes = [
+            self._make_node(key, value, now + left, ttl)
+            for key, value, left, ttl in entries[: self.capacity]
+        ]
+        nodes.reverse()
+        self._splice_to_front(nodes)
+        for node in nodes:
+            self._index(node)
+            node.expiry_entry = [node.item.expiry_time, next(self._expiry_seq), node]
+        self._expiry_heap[:] = [node.expiry_entry for node in nodes]
+        heapq.heapify(self._expiry_heap)
+        self.total_weight += len(nodes)
+        if self._stats is not None:
+            self._stats.inserts += len(nodes)
+        return len(nodes)
+
+    def _load_slow(self, entries: list[tuple]) -> int:
+        # Entries are most recent first, so replay them oldest first.
+        for key, value, left, ttl in reversed(entries):
+            self.put(key, value, ttl=left)
+            node = self.cache.get(key)
+            if node:
+                node.item.ttl_seconds = ttl
+        return sum(key in self.cache for key, _, _, _ in entries)
+
+    def items(self, reverse: bool = False) -> Iterator[tuple[Any, Any]]:
+        # Lazily yields live (key, value) pairs, most recent first or, with
+        # reverse=True, least recent first. Reading does not refresh or
+        # reorder entries. The cache must not be modified while iterating.
+        now = self.clock()
+        node = self.tail if reverse else self.head
+        while node:
+            if now < node.item.expiry_time:
+                yield node.key, node.item.value
+            node = node.prev if reverse else node.next
+
+    def keys(self, reverse: bool = False) -> Iterator[Any]:
+        return (key for key, _ in self.items(reverse))
+
+    def values(self, reverse: bool = False) -> Iterator[Any]:
+        return (value for _, value in self.items(reverse))
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.keys()
+
+    def invalidate_where(self, predicate: Callable[[Any, Any], bool]) -> int:
+        # Remove every entry, live or expired, for which predicate(key, value)
+        # is true, in one pass over the list. Returns the number removed.
+        removed = 0
+        node = self.head
+        while node:
+            next_node = node.next
+            if predicate(node.key, node.item.value):
+                self._delete(node)
+                removed += 1
+            node = next_node
+        return removed
+
+    def invalidate_prefix(self, prefix: Any) -> int:
+        # Remove the keys whose key_prefix(key) == prefix, in O(matches).
+        if self._prefixes is None:
+            raise ValueError("invalidate_prefix requires a key_prefix")
+        keys = self._prefixes.get(prefix, ())
+        removed = len(keys)
+        for key in list(keys):
+            self._delete(self.cache[key])
+        return removed
+
+    def clear(self):
+        # Drop every entry without callbacks. Stats are kept.
+        self.cache = {}
+        self.head = None
+        self.tail = None
+        self._expiry_heap[:] = []
+        self.total_weight = 0
+        if self._prefixes is not None:
+            self._prefixes = {}
+
+    def stats(self) -> CacheStats:
+        # A copy, so callers can diff snapshots. All zeros when not recording.
+        return replace(self._stats) if self._stats is not None else CacheStats()
+
+    def reset_stats(self):
+        if self._stats is not None:
+            self._stats = CacheStats()
 
     @property
     def size(self) -> int:
         return len(self.cache)
+
+
+@dataclass
+class ShardStats:
+    capacity: int
+    size: int = 0
+    gets: int = 0
+    puts: int = 0
+    hits: int = 0
+    misses: int = 0
+    # Lock acquisitions that had to wait for another thread.
+    contended: int = 0
+
+
+class ShardedLRUCache:
+    # Lock striping: keys hash onto independent LRUCache segments with their
+    # own lock, so threads touching different shards never wait on each other.
+    # Recency is tracked per shard, so eviction is LRU within a shard.
+
+    def __init__(
+        self,
+        capacity: int,
+        ttl_seconds: float,
+        shards: int = 16,
+        clock: Callable[[], float] = time.monotonic,
+        sweep_per_op: int = 0,
+        compact: bool = False,
+        lazy_promotion: bool = False,
+        expiry_mode: str = SLIDING,
+        record_stats: bool = False,
+    ):
+        if capacity < 0:
+            raise ValueError("Capacity cannot be negative")
+        if shards <= 0:
+            raise ValueError("Shards must be positive")
+
+        # Never create shards that could not hold a single entry.
+        shards = max(1, min(shards, capacity))
+        base, extra = divmod(capacity, shards)
+
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._shards = [
+            LRUCache(
+                base + (1 if i < extra else 0),
+                ttl_seconds,
+                clock=clock,
+                sweep_per_op=sweep_per_op,
+                compact=compact,
+                lazy_promotion=lazy_promotion,
+                expiry_mode=expiry_mode,
+                record_stats=record_stats,
+            )
+            for i in range(shards)
+        ]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        # Hits and misses live in each shard's CacheStats; only puts and lock
+        # contention are counted here, and only when stats are recorded, so
+        # the default get/put path is a plain lock around the shard call.
+        self._puts = [0] * shards if record_stats else None
+        self._contended = [0] * shards if record_stats else None
+
+    def _shard_index(self, key: Any) -> int:
+        return hash(key) % len(self._shards)
+
+    def _acquire(self, index: int):
+        lock = self._locks[index]
+        if self._contended is None:
+            lock.acquire()
+        elif not lock.acquire(blocking=False):
+            lock.acquire()
+            self._contended[index] += 1
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        # _shard_index inlined: get/put are the hot path.
+        index = hash(key) % len(self._locks)
+        if self._contended is None:
+            with self._locks[index]:
+                return self._shards[index].get(key, default)
+        self._acquire(index)
+        try:
+            return self._shards[index].get(key, default)
+        finally:
+            self._locks[index].release()
+
+    def peek(self, key: Any, default: Any = None) -> Any:
+        index = self._shard_index(key)
+        with self._locks[index]:
+            return self._shards[index].peek(key, default)
+
+    def put(self, key: Any, item: Any, ttl: float | None = None):
+        index = hash(key) % len(self._locks)
+        if self._puts is None:
+            with self._locks[index]:
+                self._shards[index].put(key, item, ttl)
+            return
+        self._acquire(index)
+        try:
+            self._shards[index].put(key, item, ttl)
+            self._puts[index] += 1
+        finally:
+            self._locks[index].release()
+
+    def get_many(self, keys: Iterable[Any]) -> dict[Any, Any]:
+        # One lock acquisition per shard touched, not one per key.
+        by_shard: dict[int, list[Any]] = {}
+        for key in keys:
+            by_shard.setdefault(self._shard_index(key), []).append(key)
+
+        found = {}
+        for index, shard_keys in by_shard.items():
+            self._acquire(index)
+            try:
+                found.update(self._shards[index].get_many(shard_keys))
+            finally:
+                self._locks[index].release()
+        return found
+
+    def put_many(self, items: Mapping[Any, Any], ttl: float | None = None):
+        by_shard: dict[int, dict[Any, Any]] = {}
+        for key, item in items.items():
+            by_shard.setdefault(self._shard_index(key), {})[key] = item
+
+        for index, shard_items in by_shard.items():
+            self._acquire(index)
+            try:
+                self._shards[index].put_many(shard_items, ttl)
+                if self._puts is not None:
+                    self._puts[index] += len(shard_items)
+            finally:
+                self._locks[index].release()
+
+    def purge_expired(self, max_items: int | None = None) -> int:
+        # `max_items` is a per-shard budget; each shard is locked only while
+        # it is being swept.
+        removed = 0
+        for index, shard in enumerate(self._shards):
+            self._acquire(index)
+            try:
+                removed += shard.purge_expired(max_items)
+            finally:
+                self._locks[index].release()
+        return removed
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._shards)
+
+    @property
+    def size(self) -> int:
+        # len() of each shard dict is atomic, so no lock is needed for a total.
+        return sum(shard.size for shard in self._shards)
+
+    def shard_stats(self) -> list[ShardStats]:
+        # Counters stay at zero unless the cache was built with record_stats.
+        snapshot = []
+        for index, shard in enumerate(self._shards):
+            self._acquire(index)
+            try:
+                stats = ShardStats(shard.capacity, shard.size)
+                if self._puts is not None:
+                    counts = shard.stats()
+                    stats.hits = counts.hits
+                    stats.misses = counts.misses
+                    stats.gets = counts.hits + counts.misses
+                    stats.puts = self._puts[index]
+                    stats.contended = self._contended[index]
+                snapshot.append(stats)
+            finally:
+                self._locks[index].release()
+        return snapshot
+
+
+class ExpirySweeper:
+    # Background thread that reclaims expired entries every `interval` seconds.
+    # LRUCache is not thread-safe, so pass the lock that guards it;
+    # ShardedLRUCache locks its shards itself and needs no lock.
+    def __init__(
+        self,
+        cache: LRUCache | ShardedLRUCache,
+        interval: float,
+        max_items: int | None = None,
+        lock: AbstractContextManager | None = None,
+    ):
+        if interval <= 0:
+            raise ValueError("Interval must be positive")
+        self.cache = cache
+        self.interval = interval
+        self.max_items = max_items
+        self._lock = lock
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.removed = 0
+
+    def sweep(self) -> int:
+        if self._lock is None:
+            removed = self.cache.purge_expired(self.max_items)
+        else:
+            with self._lock:
+                removed = self.cache.purge_expired(self.max_items)
+        self.removed += removed
+        return removed
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="expiry-sweeper", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sweep()
+
+    def __enter__(self) -> Self:
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class AsyncLRUCache:
+    # For use from one event loop, so no locking is needed. get_or_load()
+    # collapses concurrent misses for a key onto one loader task, and loader
+    # failures can be cached for `negative_ttl` seconds.
+    def __init__(
+        self,
+        capacity: int,
+        ttl_seconds: float,
+        negative_ttl: float = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if negative_ttl < 0:
+            raise ValueError("Negative TTL cannot be negative")
+        self._cache = LRUCache(capacity, ttl_seconds, clock=clock)
+        self._failures = (
+            LRUCache(capacity, negative_ttl, clock=clock) if negative_ttl else None
+        )
+        self._inflight: dict[Any, asyncio.Task] = {}
+
+    async def get(self, key: Any, default: Any = None) -> Any:
+        return self._cache.get(key, default)
+
+    async def put(self, key: Any, item: Any, ttl: float | None = None):
+        self._cache.put(key, item, ttl)
+        if self._failures:
+            self._failures.pop(key)
+
+    async def get_or_load(
+        self, key: Any, loader: Callable[[Any], Awaitable[Any]]
+    ) -> Any:
+        value = self._cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self._failures:
+            failure = self._failures.get(key)
+            if failure is not None:
+                # Raise a copy: re-raising the stored instance would grow its
+                # traceback on every call and hand all callers one object.
+                error, cached_tb = failure
+                try:
+                    fresh = copy.copy(error)
+                except TypeError:
+                    # __init__ does not take the exception's args, so it cannot
+                    # be rebuilt. Re-raise the stored one from the traceback it
+                    # was cached with, so at least it does not grow.
+                    fresh = None
+                if fresh is None:
+                    raise error.with_traceback(cached_tb)
+                raise fresh from error
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+        # shield: a cancelled waiter must not cancel the load for the others.
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Any, loader: Callable[[Any], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader(key)
+        except Exception as exc:
+            if self._failures:
+                self._failures.put(key, (exc, exc.__traceback__))
+            raise
+        finally:
+            del self._inflight[key]
+        self._cache.put(key, value)
+        return value
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    @property
+    def size(self) -> int:
+        return self._cache.size
+
+
+class RefreshAheadCache:
+    # Loading cache that keeps hot keys warm. A hit older than
+    # `refresh_ratio * ttl_seconds` is returned at once while `loader` reloads
+    # it on the executor. Past the TTL, the stale value is still served for
+    # `stale_grace` seconds while the reload runs. Only misses, and entries
+    # older than ttl + grace, wait for the loader.
+    def __init__(
+        self,
+        loader: Callable[[Any], Any],
+        capacity: int,
+        ttl_seconds: float,
+        refresh_ratio: float = 0.8,
+        stale_grace: float = 0,
+        executor: Executor | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not 0 < refresh_ratio <= 1:
+            raise ValueError("Refresh ratio must be in (0, 1]")
+        if stale_grace < 0:
+            raise ValueError("Stale grace cannot be negative")
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.refresh_after = refresh_ratio * ttl_seconds
+        self.clock = clock
+        # Entries are (value, loaded_at) and live for ttl + grace from the
+        # last load; reads must not extend that.
+        self._cache = LRUCache(
+            capacity, ttl_seconds + stale_grace, clock=clock, expiry_mode=ABSOLUTE
+        )
+        self._lock = threading.Lock()
+        # key -> token of the one reload in flight. A reload only stores its
+        # value if its token is still there, so put() and invalidate() can
+        # cancel it by dropping the token.
+        self._refreshing: dict[Any, object] = {}
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="cache-refresh"
+        )
+        self.refreshes = 0
+        self.stale_hits = 0
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            entry = self._cache.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, loaded_at = entry
+                age = self.clock() - loaded_at
+                if age >= self.refresh_after:
+                    if age >= self.ttl_seconds:
+                        self.stale_hits += 1
+                    self._schedule_refresh(key)
+                return value
+        value = self.loader(key)
+        self.put(key, value)
+        return value
+
+    def put(self, key: Any, item: Any):
+        with self._lock:
+            self._refreshing.pop(key, None)
+            self._cache.put(key, (item, self.clock()))
+
+    def invalidate(self, key: Any):
+        with self._lock:
+            self._refreshing.pop(key, None)
+            self._cache.pop(key)
+
+    def _schedule_refresh(self, key: Any):
+        # Called with the lock held; at most one reload per key in flight.
+        if key in self._refreshing:
+            return
+        token = self._refreshing[key] = object()
+        try:
+            self._executor.submit(self._refresh, key, token)
+        except RuntimeError:
+            # The executor is shut down (get() after close()); keep serving
+            # the cached value without a reload.
+            del self._refreshing[key]
+
+    def _refresh(self, key: Any, token: object):
+        try:
+            value = self.loader(key)
+        except Exception:  # noqa: BLE001, a failed reload keeps the old value
+            # Keep serving the old value until its grace period runs out.
+            with self._lock:
+                if self._refreshing.get(key) is token:
+                    del self._refreshing[key]
+            return
+        with self._lock:
+            if self._refreshing.get(key) is not token:
+                # Invalidated or overwritten while loading.
+                return
+            del self._refreshing[key]
+            self._cache.put(key, (value, self.clock()))
+            self.refreshes += 1
+
+    @property
+    def size(self) -> int:
+        return self._cache.size
+
+    def close(self):
+        # Wait for pending reloads and stop the pool if this cache created it.
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "misses", "evictions", "capacity", "currsize"]
+)
+
+_KWD_MARK = (object(),)
+_FAST_TYPES = {int, str}
+
+
+def _make_key(args: tuple, kwargs: dict, typed: bool) -> Any:
+    # Same scheme as functools.lru_cache: a flat tuple, with a lone int/str
+    # argument used as the key itself so no tuple has to be built or hashed.
+    key = args
+    if kwargs:
+        key += _KWD_MARK
+        for item in kwargs.items():
+            key += item
+    if typed:
+        key += tuple(type(v) for v in args)
+        if kwargs:
+            key += tuple(type(v) for v in kwargs.values())
+    elif len(key) == 1 and type(key[0]) in _FAST_TYPES:
+        return key[0]
+    return key
+
+
+def ttl_lru_cache(
+    capacity: int = 128,
+    ttl: float = 600,
+    typed: bool = False,
+    clock: Callable[[], float] = time.monotonic,
+):
+    """
+    functools.lru_cache with a TTL. Arguments must be hashable; with
+    typed=True, f(1) and f(1.0) are cached separately. The wrapper exposes
+    cache_info() and cache_clear(). The cache is locked only around lookups
+    and stores, so concurrent misses for one key may each call the function.
+    """
+
+    def decorator(func):
+        cache = LRUCache(capacity, ttl, clock=clock, record_stats=True)
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _make_key(args, kwargs, typed)
+            with lock:
+                value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            value = func(*args, **kwargs)
+            with lock:
+                cache.put(key, value)
+            return value
+
+        def cache_info() -> CacheInfo:
+            with lock:
+                stats = cache.stats()
+                # Entries dropped to make room: LRU victims and purged
+                # expired items.
+                evictions = stats.evictions + stats.expired_on_purge
+                return CacheInfo(
+                    stats.hits, stats.misses, evictions, capacity, cache.size
+                )
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                cache.reset_stats()
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
+
+
+class SegmentedLRUCache:
+    # Scan-resistant SLRU. New keys enter a probation segment; a second hit
+    # promotes them to a protected segment, whose LRU entries are demoted
+    # back to probation. A one-off scan only churns probation, so the hot set
+    # in protected survives. With `admission` (TinyLFU) a new key is only
+    # stored if it is more popular than the entry it would evict.
+    def __init__(
+        self,
+        capacity: int,
+        ttl_seconds: float,
+        protected_ratio: float = 0.8,
+        clock: Callable[[], float] = time.monotonic,
+        admission: TinyLFU | None = None,
+    ):
+        if capacity < 0:
+            raise ValueError("Capacity cannot be negative")
+        if not 0 <= protected_ratio < 1:
+            raise ValueError("Protected ratio must be in [0, 1)")
+
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.admission = admission
+        # Probation may grow into space protected is not using, so only the
+        # protected segment has a fixed share.
+        self.probation = LRUCache(capacity, ttl_seconds, clock=clock)
+        self.protected = LRUCache(
+            int(capacity * protected_ratio), ttl_seconds, clock=clock
+        )
+
+    def _promote(self, node: CacheNode, now: float):
+        self.probation._delete(node)
+        protected = self.protected
+        if protected.capacity == 0:
+            self.probation._adopt(node, now)
+            return
+        if protected.size >= protected.capacity:
+            protected._purge_expired(now, None)
+        if protected.size >= protected.capacity and protected.tail:
+            demoted = protected.tail
+            protected._delete(demoted)
+            self.probation._adopt(demoted, now)
+        protected._adopt(node, now)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if self.admission is not None:
+            self.admission.record(key)
+        value = self.protected.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = self.probation.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self._promote(self.probation.cache[key], self.clock())
+        return value
+
+    def put(self, key: Any, item: Any, ttl: float | None = None):
+        if self.admission is not None:
+            self.admission.record_write(key)
+        for segment in (self.protected, self.probation):
+            if key in segment.cache:
+                segment.put(key, item, ttl)
+                return
+
+        if self.capacity == 0:
+            return
+        if self.size >= self.capacity:
+            now = self.clock()
+            self.probation._purge_expired(now, None)
+            self.protected._purge_expired(now, None)
+        if self.size >= self.capacity:
+            victim_cache = self.probation if self.probation.tail else self.protected
+            victim = victim_cache.tail
+            if self.admission is not None and not self.admission.admit(key, victim.key):
+                return
+            victim_cache._evict_lru()
+        self.probation.put(key, item, ttl)
+
+    @property
+    def size(self) -> int:
+        return self.probation.size + self.protected.size
+
+
+# FileLock state per path in this process: path -> [fd, thread lock, open count].
+_FILE_LOCKS: dict[str, list] = {}
+_FILE_LOCKS_GUARD = threading.Lock()
+
+
+class FileLock:
+    # Exclusive lock shared by every process that opens the same path. POSIX
+    # record locks belong to the process, and closing any fd on the file drops
+    # them, so all FileLocks on one path in a process share a single fd and
+    # thread lock. The thread lock serializes threads, and handles, within it.
+    def __init__(self, path: str):
+        import fcntl
+
+        self._fcntl = fcntl
+        self._path = os.path.abspath(path)
+        with _FILE_LOCKS_GUARD:
+            shared = _FILE_LOCKS.get(self._path)
+            if shared is None:
+                fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+                shared = _FILE_LOCKS[self._path] = [fd, threading.Lock(), 0]
+            shared[2] += 1
+        self._fd, self._thread_lock = shared[0], shared[1]
+        self._closed = False
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    def close(self):
+        # The fd is closed with the last FileLock on this path.
+        if self._closed:
+            return
+        self._closed = True
+        with _FILE_LOCKS_GUARD:
+            shared = _FILE_LOCKS[self._path]
+            shared[2] -= 1
+            if shared[2] == 0:
+                del _FILE_LOCKS[self._path]
+                os.close(self._fd)
+
+
+class SharedLRUCache:
+    # LRUCache over one multiprocessing.shared_memory segment, so every
+    # process on the host that attaches by name shares the same entries.
+    # Keys and values are bytes in fixed-size slots. The recency list and the
+    # hash chains are int32 slot indexes (-1 for none) kept in parallel
+    # arrays, and the clock must agree across processes (time.monotonic is
+    # system-wide on Linux and macOS).
+    MAGIC = b"SHMLRU01"
+    HEADER_SIZE = 64
+    # int32 header fields, stored after the magic and the default TTL.
+    _CAPACITY, _KEY_SIZE, _VALUE_SIZE, _BUCKETS, _SIZE, _HEAD, _TAIL, _FREE = range(8)
+
+    def __init__(
+        self,
+        name: str,
+        capacity: int = 0,
+        ttl_seconds: float = 0,
+        key_size: int = 64,
+        value_size: int = 1024,
+        create: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+        lock: AbstractContextManager | None = None,
+    ):
+        # create=True allocates the segment; create=False attaches to an
+        # existing one and reads its geometry from the header.
+        if create:
+            if capacity <= 0:
+                raise ValueError("Capacity must be positive")
+            if ttl_seconds <= 0:
+                raise ValueError("TTL must be positive")
+            buckets = 1 << (2 * capacity - 1).bit_length()
+            size = self.HEADER_SIZE + capacity * (16 + 24 + key_size + value_size)
+            size += 4 * buckets
+            self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+        else:
+            # track=False: only the creator's resource tracker may unlink the
+            # segment when its process exits.
+            self._shm = shared_memory.SharedMemory(name, track=False)
+            if bytes(self._shm.buf[:8]) != self.MAGIC:
+                self._shm.close()
+                raise ValueError(f"{name!r} is not a SharedLRUCache segment")
+
+        self.name = name
+        self.clock = clock
+        self._lock = lock or FileLock(
+            os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        )
+        buf = self._shm.buf
+        self._ttl = buf[8:16].cast("d")
+        self._header = buf[16 : self.HEADER_SIZE].cast("i")
+        if create:
+            self._ttl[0] = ttl_seconds
+            header = self._header
+            header[self._CAPACITY] = capacity
+            header[self._KEY_SIZE] = key_size
+            header[self._VALUE_SIZE] = value_size
+            header[self._BUCKETS] = buckets
+            header[self._HEAD] = header[self._TAIL] = -1
+
+        header = self._header
+        self.capacity = capacity = header[self._CAPACITY]
+        self.key_size = key_size = header[self._KEY_SIZE]
+        self.value_size = value_size = header[self._VALUE_SIZE]
+        buckets = header[self._BUCKETS]
+        self._mask = buckets - 1
+
+        # Structure of arrays: 8-byte columns first so every view is aligned.
+        views = []
+        offset = self.HEADER_SIZE
+        for fmt, count in (
+            ("d", capacity),  # expiry time
+            ("d", capacity),  # TTL
+            ("i", buckets),  # first slot in each hash bucket
+            ("i", capacity),  # prev
+            ("i", capacity),  # next, also links the free list
+            ("i", capacity),  # next slot in the same bucket
+            ("I", capacity),  # key hash
+            ("I", capacity),  # key length
+            ("I", capacity),  # value length
+        ):
+            end = offset + count * (8 if fmt == "d" else 4)
+            views.append(buf[offset:end].cast(fmt))
+            offset = end
+        (
+            self._expiry,
+            self._ttls,
+            self._buckets,
+            self._prev,
+            self._next,
+            self._chain,
+            self._hashes,
+            self._key_lens,
+            self._value_lens,
+        ) = views
+        self._keys = buf[offset : offset + capacity * key_size]
+        offset += capacity * key_size
+        self._values = buf[offset : offset + capacity * value_size]
+
+        if create:
+            # -1 is all ones in two's complement.
+            self._buckets.cast("B")[:] = b"\xff" * (4 * buckets)
+            for slot in range(capacity - 1):
+                self._next[slot] = slot + 1
+            self._next[capacity - 1] = -1
+            header[self._FREE] = 0
+            # Last: a process attaching before this sees no MAGIC and fails,
+            # instead of walking zeroed buckets and chains.
+            buf[:8] = self.MAGIC
+
+    def _find(self, key: bytes, key_hash: int) -> int:
+        slot = self._buckets[key_hash & self._mask]
+        key_size = self.key_size
+        while slot != -1:
+            if (
+                self._hashes[slot] == key_hash
+                and self._key_lens[slot] == len(key)
+                and self._keys[slot * key_size : slot * key_size + len(key)] == key
+            ):
+                return slot
+            slot = self._chain[slot]
+        return -1
+
+    def _unlink(self, slot: int):
+        header = self._header
+        prev, next_ = self._prev[slot], self._next[slot]
+        if prev != -1:
+            self._next[prev] = next_
+        else:
+            header[self._HEAD] = next_
+        if next_ != -1:
+            self._prev[next_] = prev
+        else:
+            header[self._TAIL] = prev
+
+    def _add_to_front(self, slot: int):
+        header = self._header
+        head = header[self._HEAD]
+        self._prev[slot] = -1
+        self._next[slot] = head
+        if head != -1:
+            self._prev[head] = slot
+        else:
+            header[self._TAIL] = slot
+        header[self._HEAD] = slot
+
+    def _remove(self, slot: int):
+        # Unlink from the recency list and the hash chain, then free the slot.
+        self._unlink(slot)
+        bucket = self._hashes[slot] & self._mask
+        current = self._buckets[bucket]
+        if current == slot:
+            self._buckets[bucket] = self._chain[slot]
+        else:
+            while self._chain[current] != slot:
+                current = self._chain[current]
+            self._chain[current] = self._chain[slot]
+        header = self._header
+        self._next[slot] = header[self._FREE]
+        header[self._FREE] = slot
+        header[self._SIZE] -= 1
+
+    def get(self, key: bytes, default: Any = None) -> bytes | Any:
+        key_hash = zlib.crc32(key)
+        with self._lock:
+            slot = self._find(key, key_hash)
+            if slot == -1:
+                return default
+            now = self.clock()
+            if now >= self._expiry[slot]:
+                self._remove(slot)
+                return default
+            self._expiry[slot] = now + self._ttls[slot]
+            if self._header[self._HEAD] != slot:
+                self._unlink(slot)
+                self._add_to_front(slot)
+            start = slot * self.value_size
+            return bytes(self._values[start : start + self._value_lens[slot]])
+
+    def put(self, key: bytes, value: bytes, ttl: float | None = None):
+        if len(key) > self.key_size:
+            raise ValueError(f"Key is longer than key_size={self.key_size}")
+        if len(value) > self.value_size:
+            raise ValueError(f"Value is longer than value_size={self.value_size}")
+        if ttl is None:
+            ttl = self._ttl[0]
+        elif ttl <= 0:
+            raise ValueError("TTL must be positive")
+        key_hash = zlib.crc32(key)
+        header = self._header
+        with self._lock:
+            slot = self._find(key, key_hash)
+            if slot != -1:
+                self._unlink(slot)
+            else:
+                if header[self._FREE] == -1:
+                    self._remove(header[self._TAIL])
+                slot = header[self._FREE]
+                header[self._FREE] = self._next[slot]
+                header[self._SIZE] += 1
+                start = slot * self.key_size
+                self._keys[start : start + len(key)] = key
+                self._key_lens[slot] = len(key)
+                self._hashes[slot] = key_hash
+                bucket = key_hash & self._mask
+                self._chain[slot] = self._buckets[bucket]
+                self._buckets[bucket] = slot
+            start = slot * self.value_size
+            self._values[start : start + len(value)] = value
+            self._value_lens[slot] = len(value)
+            self._expiry[slot] = self.clock() + ttl
+            self._ttls[slot] = ttl
+            self._add_to_front(slot)
+
+    def pop(self, key: bytes, default: Any = None) -> bytes | Any:
+        key_hash = zlib.crc32(key)
+        with self._lock:
+            slot = self._find(key, key_hash)
+            if slot == -1:
+                return default
+            start = slot * self.value_size
+            value = bytes(self._values[start : start + self._value_lens[slot]])
+            expired = self.clock() >= self._expiry[slot]
+            self._remove(slot)
+            return default if expired else value
+
+    def keys(self) -> list[bytes]:
+        # Keys from most to least recently used, including expired ones.
+        keys = []
+        with self._lock:
+            slot = self._header[self._HEAD]
+            while slot != -1:
+                start = slot * self.key_size
+                keys.append(bytes(self._keys[start : start + self._key_lens[slot]]))
+                slot = self._next[slot]
+        return keys
+
+    @property
+    def size(self) -> int:
+        return self._header[self._SIZE]
+
+    def close(self):
+        # Detach this process. The segment stays until unlink() is called.
+        for view in (
+            self._ttl,
+            self._header,
+            self._expiry,
+            self._ttls,
+            self._buckets,
+            self._prev,
+            self._next,
+            self._chain,
+            self._hashes,
+            self._key_lens,
+            self._value_lens,
+            self._keys,
+            self._values,
+        ):
+            view.release()
+        self._shm.close()
+        if isinstance(self._lock, FileLock):
+            self._lock.close()
+
+    def unlink(self):
+        # Destroy the segment once every process has closed it.
+        self._shm.unlink()
+        try:
+            os.unlink(os.path.join(tempfile.gettempdir(), f"{self.name}.lock"))
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DiskTier:
+    # Append-only log of pickled (key, value) records, read back through an
+    # mmap. The index maps key -> [offset, length, expiry_time, ttl_seconds]
+    # in demotion order, so the oldest entries are dropped first when the log
+    # outgrows `max_bytes`. Dropped and replaced records are garbage until
+    # compact() rewrites the live ones into a fresh file.
+    MIN_COMPACT_BYTES = 1 << 20
+
+    def __init__(self, path: str | os.PathLike, max_bytes: int | None = None):
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("Max bytes must be positive")
+        self.path = os.fspath(path)
+        self.max_bytes = max_bytes
+        self.index: dict[Any, list] = {}
+        self.live_bytes = 0
+        self.dead_bytes = 0
+        self.compactions = 0
+        self._file = open(self.path, "w+b")  # noqa: SIM115, closed by close()
+        self._end = 0
+        self._map: mmap.mmap | None = None
+
+    def put(self, key: Any, value: Any, expiry_time: float, ttl_seconds: float):
+        self.discard(key)
+        record = pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(record)
+        self.index[key] = [self._end, len(record), expiry_time, ttl_seconds]
+        self._end += len(record)
+        self.live_bytes += len(record)
+        if self.max_bytes is not None:
+            while self.live_bytes > self.max_bytes:
+                self.discard(next(iter(self.index)))
+        self._maybe_compact()
+
+    def get(self, key: Any, now: float) -> tuple[Any, float, float] | None:
+        # Returns (value, expiry_time, ttl_seconds) for a live entry and keeps
+        # the record; an expired one is discarded.
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        offset, length, expiry_time, ttl_seconds = entry
+        if now >= expiry_time:
+            self.discard(key)
+            return None
+        return self._read(offset, length)[1], expiry_time, ttl_seconds
+
+    def pop(self, key: Any, now: float) -> tuple[Any, float, float] | None:
+        found = self.get(key, now)
+        self.discard(key)
+        return found
+
+    def discard(self, key: Any):
+        entry = self.index.pop(key, None)
+        if entry is not None:
+            self.live_bytes -= entry[1]
+            self.dead_bytes += entry[1]
+
+    def _read(self, offset: int, length: int) -> tuple[Any, Any]:
+        if self._map is None or offset + length > len(self._map):
+            # The log grew past the current mapping: flush and map it again.
+            self._file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return pickle.loads(self._map[offset : offset + length])
+
+    def _maybe_compact(self):
+        if self.dead_bytes > max(self.live_bytes, self.MIN_COMPACT_BYTES):
+            self.compact()
+
+    def compact(self, now: float | None = None):
+        # Rewrite the live records, dropping expired ones when `now` is given,
+        # and swap the new file in.
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.flush()
+        tmp_path = f"{self.path}.compact"
+        offset = 0
+        index = {}
+        with open(self.path, "rb") as old, open(tmp_path, "wb") as new:
+            for key, (start, length, expiry_time, ttl) in self.index.items():
+                if now is not None and now >= expiry_time:
+                    continue
+                old.seek(start)
+                new.write(old.read(length))
+                index[key] = [offset, length, expiry_time, ttl]
+                offset += length
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "r+b")  # noqa: SIM115, closed by close()
+        self._file.seek(offset)
+        self._end = offset
+        self.index = index
+        self.live_bytes = offset
+        self.dead_bytes = 0
+        self.compactions += 1
+
+    @property
+    def size(self) -> int:
+        return len(self.index)
+
+    @property
+    def file_bytes(self) -> int:
+        return self._end
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class TieredLRUCache(LRUCache):
+    # An LRUCache whose evicted entries are demoted to a DiskTier instead of
+    # being discarded. A memory miss checks the disk tier and promotes a live
+    # entry back with its remaining TTL. Expired entries are not demoted.
+    def __init__(
+        self,
+        capacity: int,
+        ttl_seconds: float,
+        path: str | os.PathLike,
+        max_disk_bytes: int | None = None,
+        **kwargs: Any,
+    ):
+        super().__init__(capacity, ttl_seconds, **kwargs)
+        self.disk = DiskTier(path, max_disk_bytes)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _drop(self, node: CacheNode, reason: str):
+        super()._drop(node, reason)
+        if reason == EVICTED:
+            item = node.item
+            self.disk.put(node.key, item.value, item.expiry_time, item.ttl_seconds)
+
+    def _promote(self, key: Any) -> Any:
+        now = self.clock()
+        found = self.disk.get(key, now)
+        if found is None:
+            self.misses += 1
+            return _MISSING
+        value, expiry_time, ttl_seconds = found
+        self.disk_hits += 1
+        super().put(key, value, ttl=expiry_time - now)
+        node = self.cache.get(key)
+        # The put may refuse the entry (admission, weight, capacity 0); then
+        # the disk copy is the only one and must stay.
+        if node:
+            node.item.ttl_seconds = ttl_seconds
+            self.disk.discard(key)
+        return value
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        value = super().get(key, _MISSING)
+        if value is _MISSING:
+            value = self._promote(key)
+            return default if value is _MISSING else value
+        self.memory_hits += 1
+        return value
+
+    def get_many(self, keys: Iterable[Any]) -> dict[Any, Any]:
+        keys = list(keys)
+        found = super().get_many(keys)
+        self.memory_hits += len(found)
+        for key in keys:
+            if key not in found:
+                value = self._promote(key)
+                if value is not _MISSING:
+                    found[key] = value
+        return found
+
+    def put(self, key: Any, item: Any, ttl: float | None = None):
+        super().put(key, item, ttl)
+        # Drop any older copy, including one demoted by this very put.
+        self.disk.discard(key)
+
+    def put_many(self, items: Mapping[Any, Any], ttl: float | None = None):
+        super().put_many(items, ttl)
+        for key in items:
+            self.disk.discard(key)
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        value = super().pop(key, _MISSING)
+        if value is _MISSING:
+            found = self.disk.pop(key, self.clock())
+            return default if found is None else found[0]
+        self.disk.discard(key)
+        return value
+
+    def invalidate_where(self, predicate: Callable[[Any, Any], bool]) -> int:
+        removed = super().invalidate_where(predicate)
+        # Disk values have to be read back to test them.
+        disk = self.disk
+        for key, (offset, length, _, _) in list(disk.index.items()):
+            if predicate(key, disk._read(offset, length)[1]):
+                disk.discard(key)
+                removed += 1
+        return removed
+
+    def invalidate_prefix(self, prefix: Any) -> int:
+        removed = super().invalidate_prefix(prefix)
+        # The disk tier has no prefix index; one scan over its keys.
+        for key in [k for k in self.disk.index if self.key_prefix(k) == prefix]:
+            self.disk.discard(key)
+            removed += 1
+        return removed
+
+    def clear(self):
+        super().clear()
+        for key in list(self.disk.index):
+            self.disk.discard(key)
+
+    def compact(self):
+        self.disk.compact(self.clock())
+
+    def close(self):
+        self.disk.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,6 +1,43 @@
+import asyncio
+import multiprocessing
 import pytest
+import random
+import threading
 import time
-from lru_cache_answer import LRUCache
+import traceback
+import uuid
+from concurrent.futures import Executor
+from lru_cache_answer import (
+    ABSOLUTE,
+    EVICTED,
+    EXPIRED,
+    AsyncLRUCache,
+    CacheStats,
+    CoarseClock,
+    CompactCacheNode,
+    CountMinSketch,
+    ExpirySweeper,
+    FileLock,
+    LRUCache,
+    RefreshAheadCache,
+    SegmentedLRUCache,
+    ShardedLRUCache,
+    SharedLRUCache,
+    TieredLRUCache,
+    TinyLFU,
+    ttl_lru_cache,
+)
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
 
 
 # ============================================================================
@@ -372,5 +409,1683 @@ def test_rapid_expiration_and_insertion():
     assert cache.get("key4") == "value4"
 
 
+# ============================================================================
+# Sharded Cache Tests
+# ============================================================================
+
+
+def test_sharded_put_and_get():
+    # Int keys hash to themselves, so every shard gets exactly 4 of them
+    # whatever PYTHONHASHSEED is; str keys could overfill one shard.
+    cache = ShardedLRUCache(capacity=64, ttl_seconds=10, shards=8)
+    for i in range(32):
+        cache.put(i, f"value{i}")
+
+    for i in range(32):
+        assert cache.get(i) == f"value{i}"
+    assert cache.get("missing") is None
+    assert cache.size == 32
+
+
+def test_sharded_size_never_exceeds_capacity():
+    cache = ShardedLRUCache(capacity=10, ttl_seconds=10, shards=4)
+    assert sum(stats.capacity for stats in cache.shard_stats()) == 10
+
+    for i in range(100):
+        cache.put(i, i)
+    assert cache.size <= 10
+
+
+def test_sharded_never_creates_more_shards_than_capacity():
+    cache = ShardedLRUCache(capacity=3, ttl_seconds=10, shards=16)
+    assert cache.shard_count == 3
+
+    cache.put("key1", "value1")
+    assert cache.get("key1") == "value1"
+
+
+def test_sharded_stats_count_hits_and_misses():
+    cache = ShardedLRUCache(capacity=16, ttl_seconds=10, shards=4, record_stats=True)
+    cache.put("key1", None)
+    assert cache.get("key1") is None
+    assert cache.get("key2") is None
+
+    stats = cache.shard_stats()
+    assert sum(s.puts for s in stats) == 1
+    assert sum(s.hits for s in stats) == 1
+    assert sum(s.misses for s in stats) == 1
+    assert sum(s.size for s in stats) == 1
+
+
+def test_sharded_stats_are_opt_in():
+    cache = ShardedLRUCache(capacity=16, ttl_seconds=10, shards=4)
+    cache.put("key1", "value1")
+    assert cache.get("key1") == "value1"
+
+    stats = cache.shard_stats()
+    assert sum(s.size for s in stats) == 1
+    assert sum(s.gets + s.puts + s.contended for s in stats) == 0
+
+
+def test_sharded_concurrent_access():
+    cache = ShardedLRUCache(capacity=8000, ttl_seconds=10, shards=8, record_stats=True)
+
+    def worker(offset):
+        for i in range(500):
+            cache.put(offset + i, i)
+            assert cache.get(offset + i) == i
+
+    threads = [threading.Thread(target=worker, args=(n * 1000,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert cache.size == 4000
+    assert sum(s.gets for s in cache.shard_stats()) == 8 * 500
+
+
+# ============================================================================
+# Clock Tests
+# ============================================================================
+
+
+def test_injected_clock_controls_expiry():
+    clock = FakeClock()
+    cache = LRUCache(capacity=3, ttl_seconds=5, clock=clock)
+    cache.put("key1", "value1")
+
+    clock.advance(4.9)
+    assert cache.get("key1") == "value1"
+
+    # get refreshed the TTL at t=4.9, so the item lives until t=9.9
+    clock.advance(4.9)
+    assert cache.get("key1") == "value1"
+
+    clock.advance(5)
+    assert cache.get("key1") is None
+    assert cache.size == 0
+
+
+def test_default_clock_is_monotonic():
+    cache = LRUCache(capacity=3, ttl_seconds=10)
+    assert cache.clock is time.monotonic
+
+
+def test_coarse_clock_only_advances_on_tick():
+    source = FakeClock(100.0)
+    clock = CoarseClock(source)
+    cache = LRUCache(capacity=3, ttl_seconds=1, clock=clock)
+    cache.put("key1", "value1")
+
+    source.advance(2)
+    assert clock() == 100.0
+    assert cache.get("key1") == "value1"
+
+    assert clock.tick() == 102.0
+    assert cache.get("key1") is None
+
+
+def test_coarse_clock_background_ticker():
+    clock = CoarseClock()
+    start = clock()
+    clock.start(0.01)
+    try:
+        time.sleep(0.05)
+        assert clock() > start
+    finally:
+        clock.stop()
+
+
+def test_sharded_cache_uses_injected_clock():
+    clock = FakeClock()
+    cache = ShardedLRUCache(capacity=8, ttl_seconds=1, shards=2, clock=clock)
+    cache.put("key1", "value1")
+    clock.advance(1)
+    assert cache.get("key1") is None
+
+
+# ============================================================================
+# Expiry Sweep Tests
+# ============================================================================
+
+
+def test_purge_expired_reclaims_without_inserts():
+    clock = FakeClock()
+    cache = LRUCache(capacity=10, ttl_seconds=5, clock=clock)
+    for i in range(5):
+        cache.put(f"key{i}", i)
+    clock.advance(3)
+    cache.put("fresh", "value")
+
+    clock.advance(3)
+    assert cache.purge_expired() == 5
+    assert cache.size == 1
+    assert cache.get("fresh") == "value"
+
+
+def test_purge_expired_bounded_work_resumes():
+    clock = FakeClock()
+    cache = LRUCache(capacity=10, ttl_seconds=1, clock=clock)
+    for i in range(6):
+        cache.put(i, i)
+    clock.advance(1)
+
+    assert cache.purge_expired(max_items=4) == 4
+    assert cache.size == 2
+    assert cache.purge_expired(max_items=4) == 2
+    assert cache.size == 0
+
+
+def test_purge_expired_skips_refreshed_entries():
+    clock = FakeClock()
+    cache = LRUCache(capacity=10, ttl_seconds=5, clock=clock)
+    for i in range(4):
+        cache.put(i, i)
+
+    clock.advance(4)
+    cache.get(1)
+    clock.advance(1)
+
+    assert cache.purge_expired() == 3
+    assert cache.get(1) == 1
+    clock.advance(5)
+    cache.put("fresh", "value")
+
+    assert cache.purge_expired() == 0
+    assert cache.size == 1
+
+
+def test_sweep_per_op_reclaims_on_get():
+    clock = FakeClock()
+    cache = LRUCache(capacity=10, ttl_seconds=5, clock=clock, sweep_per_op=2)
+    for i in range(4):
+        cache.put(i, i)
+    clock.advance(3)
+    cache.put("hot", "value")
+    clock.advance(3)
+
+    assert cache.size == 5
+    cache.get("hot")
+    assert cache.size == 3
+    cache.get("hot")
+    assert cache.size == 1
+
+
+def test_expiry_sweeper_thread_reclaims_entries():
+    cache = ShardedLRUCache(capacity=100, ttl_seconds=0.01, shards=4)
+    for i in range(50):
+        cache.put(i, i)
+
+    with ExpirySweeper(cache, interval=0.01) as sweeper:
+        deadline = time.monotonic() + 2
+        while cache.size and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert cache.size == 0
+    assert sweeper.removed == 50
+
+
+def test_expiry_sweeper_uses_lock_for_plain_cache():
+    clock = FakeClock()
+    lock = threading.Lock()
+    cache = LRUCache(capacity=10, ttl_seconds=1, clock=clock)
+    cache.put("key1", "value1")
+    clock.advance(1)
+
+    sweeper = ExpirySweeper(cache, interval=1, lock=lock)
+    assert sweeper.sweep() == 1
+    assert cache.size == 0
+
+
+# ============================================================================
+# Per-key TTL Tests
+# ============================================================================
+
+
+def test_put_with_per_key_ttl():
+    clock = FakeClock()
+    cache = LRUCache(capacity=10, ttl_seconds=60, clock=clock)
+    cache.put("short", "value1", ttl=1)
+    cache.put("default", "value2")
+    cache.put("long", "value3", ttl=3600)
+
+    clock.advance(1)
+    assert cache.get("short") is None
+    assert cache.get("default") == "value2"
+
+    clock.advance(120)
+    assert cache.get("default") is None
+    assert cache.get("long") == "value3"
+
+
+def test_per_key_ttl_is_kept_on_refresh():
+    clock = FakeClock()
+    cache = LRUCache(capacity=10, ttl_seconds=60, clock=clock)
+    cache.put("key1", "value1", ttl=2)
+
+    clock.advance(1.5)
+    assert cache.get("key1") == "value1"
+    clock.advance(1.5)
+    assert cache.get("key1") == "value1"
+    clock.advance(2)
+    assert cache.get("key1") is None
+
+
+def test_update_with_shorter_ttl_is_reclaimed():
+    clock = FakeClock()
+    cache = LRUCache(capacity=10, ttl_seconds=3600, clock=clock)
+    cache.put("key1", "value1")
+    cache.put("key1", "value2", ttl=1)
+
+    clock.advance(1)
+    assert cache.purge_expired() == 1
+    assert cache.size == 0
+
+
+def test_expired_entries_reclaimed_from_middle_of_list():
+    clock = FakeClock()
+    cache = LRUCache(capacity=3, ttl_seconds=60, clock=clock)
+    cache.put("old", "value1")
+    cache.put("short", "value2", ttl=1)
+    cache.put("new", "value3")
+
+    clock.advance(1)
+    # "short" sits between head and tail; it is reclaimed instead of "old"
+    cache.put("key4", "value4")
+    assert cache.get("old") == "value1"
+    assert cache.get("short") is None
+    assert cache.size == 3
+
+
+def test_negative_per_key_ttl():
+    cache = LRUCache(capacity=3, ttl_seconds=10)
+    with pytest.raises(ValueError):
+        cache.put("key1", "value1", ttl=-1)
+
+
+def test_expiry_heap_stays_bounded():
+    clock = FakeClock()
+    cache = LRUCache(capacity=10, ttl_seconds=3600, clock=clock)
+    for i in range(10_000):
+        cache.put(i, i)
+
+    assert cache.size == 10
+    assert len(cache._expiry_heap) <= 2 * cache.size + 16
+
+
+def test_sharded_put_with_per_key_ttl():
+    clock = FakeClock()
+    cache = ShardedLRUCache(capacity=8, ttl_seconds=60, shards=2, clock=clock)
+    cache.put("key1", "value1", ttl=1)
+    clock.advance(1)
+    assert cache.get("key1") is None
+
+
+# ============================================================================
+# Compact Storage Tests
+# ============================================================================
+
+
+def test_compact_nodes_have_no_instance_dict():
+    cache = LRUCache(capacity=3, ttl_seconds=10, compact=True)
+    cache.put("key1", "value1")
+
+    node = cache.cache["key1"]
+    assert isinstance(node, CompactCacheNode)
+    assert not hasattr(node, "__dict__")
+    assert node.item.value == "value1"
+
+
+def test_compact_cache_evicts_and_updates():
+    cache = LRUCache(capacity=2, ttl_seconds=10, compact=True)
+    cache.put("key1", "value1")
+    cache.put("key2", "value2")
+    cache.get("key1")
+    cache.put("key2", "updated")
+    cache.put("key3", "value3")
+
+    assert cache.get("key1") is None
+    assert cache.get("key2") == "updated"
+    assert cache.get("key3") == "value3"
+
+
+def test_compact_cache_expires_items():
+    clock = FakeClock()
+    cache = LRUCache(capacity=3, ttl_seconds=1, clock=clock, compact=True)
+    cache.put("key1", "value1")
+    cache.put("key2", "value2", ttl=5)
+
+    clock.advance(1)
+    assert cache.purge_expired() == 1
+    assert cache.get("key2") == "value2"
+
+
+# ============================================================================
+# Batch API Tests
+# ============================================================================
+
+
+def recency(cache):
+    keys = []
+    node = cache.head
+    while node:
+        keys.append(node.key)
+        node = node.next
+    return keys
+
+
+def test_get_many_returns_hits_only():
+    cache = LRUCache(capacity=5, ttl_seconds=10)
+    cache.put("key1", "value1")
+    cache.put("key2", None)
+
+    assert cache.get_many(["key1", "key2", "missing"]) == {
+        "key1": "value1",
+        "key2": None,
+    }
+
+
+def test_get_many_promotes_hits_like_sequential_gets():
+    cache = LRUCache(capacity=5, ttl_seconds=10)
+    for i in range(5):
+        cache.put(i, i)
+
+    cache.get_many([1, 3, 1, 9])
+    assert recency(cache) == [1, 3, 4, 2, 0]
+
+    cache.put(5, 5)
+    assert cache.get(0) is None
+
+
+def test_get_many_drops_expired_entries():
+    clock = FakeClock()
+    cache = LRUCache(capacity=5, ttl_seconds=10, clock=clock)
+    cache.put("short", "value1", ttl=1)
+    cache.put("long", "value2")
+
+    clock.advance(1)
+    assert cache.get_many(["short", "long"]) == {"long": "value2"}
+    assert cache.size == 1
+
+
+def test_put_many_evicts_once_for_the_batch():
+    cache = LRUCache(capacity=4, ttl_seconds=10)
+    cache.put("old1", 1)
+    cache.put("old2", 2)
+    cache.put("old3", 3)
+
+    cache.put_many({"old1": 10, "new1": 20, "new2": 30})
+    assert recency(cache) == ["new2", "new1", "old1", "old3"]
+    assert cache.get("old1") == 10
+    assert cache.get("old2") is None
+
+
+def test_put_many_larger_than_capacity_keeps_last_items():
+    cache = LRUCache(capacity=3, ttl_seconds=10)
+    cache.put("a", 0)
+    cache.put_many({"a": 1, "b": 2, "c": 3, "d": 4, "e": 5})
+
+    assert recency(cache) == ["e", "d", "c"]
+    assert cache.size == 3
+
+
+def test_put_many_with_ttl():
+    clock = FakeClock()
+    cache = LRUCache(capacity=5, ttl_seconds=10, clock=clock)
+    cache.put_many({"key1": 1, "key2": 2}, ttl=1)
+
+    clock.advance(1)
+    assert cache.get_many(["key1", "key2"]) == {}
+
+
+def test_batch_matches_sequential_operations():
+    rng = random.Random(7)
+    batched = LRUCache(capacity=20, ttl_seconds=10)
+    sequential = LRUCache(capacity=20, ttl_seconds=10)
+    missing = object()
+
+    for _ in range(200):
+        keys = [rng.randrange(40) for _ in range(rng.randrange(1, 30))]
+        if rng.random() < 0.5:
+            items = {key: rng.random() for key in keys}
+            batched.put_many(items)
+            for key, value in items.items():
+                sequential.put(key, value)
+        else:
+            expected = {}
+            for key in keys:
+                value = sequential.get(key, missing)
+                if value is not missing:
+                    expected[key] = value
+            assert batched.get_many(keys) == expected
+        assert recency(batched) == recency(sequential)
+
+
+def test_put_many_with_zero_ttl_keeps_list_and_dict_in_step():
+    cache = LRUCache(capacity=3, ttl_seconds=10, clock=lambda: 0.0)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put_many({"a": 9, "c": 3}, ttl=0)
+    assert sorted(recency(cache)) == sorted(cache.cache)
+    assert cache.get("b") == 2
+    assert cache.get("a") is None
+    assert cache.get("c") is None
+    # As with put(), each already-expired item makes room for the next one
+    # instead of evicting another live entry.
+    cache.put_many({"d": 4, "e": 5})
+    cache.put_many({"x": 0, "y": 0, "z": 0}, ttl=0)
+    assert sorted(recency(cache)) == sorted(cache.cache)
+    assert [cache.get(key) for key in "de"] == [4, 5]
+
+
+def test_sharded_batch_operations():
+    cache = ShardedLRUCache(capacity=64, ttl_seconds=10, shards=4, record_stats=True)
+    cache.put_many({i: i * 10 for i in range(20)})
+
+    assert cache.get_many(range(25)) == {i: i * 10 for i in range(20)}
+    stats = cache.shard_stats()
+    assert sum(s.hits for s in stats) == 20
+    assert sum(s.misses for s in stats) == 5
+
+
+def test_pop_removes_entry():
+    cache = LRUCache(capacity=3, ttl_seconds=10)
+    cache.put("key1", "value1")
+
+    assert cache.pop("key1") == "value1"
+    assert cache.pop("key1", "default") == "default"
+    assert cache.size == 0
+
+
+# ============================================================================
+# Async Cache Tests
+# ============================================================================
+
+
+def test_async_get_or_load_caches_value():
+    calls = []
+
+    async def loader(key):
+        calls.append(key)
+        return f"loaded-{key}"
+
+    async def scenario():
+        cache = AsyncLRUCache(capacity=3, ttl_seconds=10)
+        assert await cache.get_or_load("key1", loader) == "loaded-key1"
+        assert await cache.get_or_load("key1", loader) == "loaded-key1"
+        assert await cache.get("key1") == "loaded-key1"
+
+    asyncio.run(scenario())
+    assert calls == ["key1"]
+
+
+def test_async_concurrent_misses_share_one_load():
+    calls = []
+
+    async def loader(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key * 2
+
+    async def scenario():
+        cache = AsyncLRUCache(capacity=3, ttl_seconds=10)
+        waiters = [cache.get_or_load(21, loader) for _ in range(50)]
+        results = await asyncio.gather(*waiters)
+        assert results == [42] * 50
+        assert cache.inflight == 0
+
+    asyncio.run(scenario())
+    assert calls == [21]
+
+
+def test_async_failures_are_cached_negatively():
+    clock = FakeClock()
+    calls = []
+
+    async def loader(key):
+        calls.append(key)
+        if len(calls) == 1:
+            raise ConnectionError("backend down")
+        return "value"
+
+    async def scenario():
+        cache = AsyncLRUCache(capacity=3, ttl_seconds=10, negative_ttl=5, clock=clock)
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                await cache.get_or_load("key1", loader)
+
+        clock.advance(5)
+        assert await cache.get_or_load("key1", loader) == "value"
+
+    asyncio.run(scenario())
+    assert calls == ["key1", "key1"]
+
+
+def test_async_cached_failure_is_raised_as_fresh_copy():
+    async def loader(key):
+        raise ConnectionError("backend down")
+
+    async def scenario():
+        cache = AsyncLRUCache(capacity=3, ttl_seconds=10, negative_ttl=5)
+        with pytest.raises(ConnectionError) as first:
+            await cache.get_or_load("key1", loader)
+        frames = len(traceback.extract_tb(first.value.__traceback__))
+        for _ in range(50):
+            with pytest.raises(ConnectionError) as cached:
+                await cache.get_or_load("key1", loader)
+            assert cached.value is not first.value
+            assert cached.value.__cause__ is first.value
+            assert cached.value.args == ("backend down",)
+        assert len(traceback.extract_tb(first.value.__traceback__)) == frames
+
+    asyncio.run(scenario())
+
+
+class CodedError(Exception):
+    # __init__ takes different arguments than it stores in args.
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def test_async_cached_failure_that_cannot_be_copied():
+    async def loader(key):
+        raise CodedError(503, "backend down")
+
+    async def scenario():
+        cache = AsyncLRUCache(capacity=3, ttl_seconds=10, negative_ttl=5)
+        with pytest.raises(CodedError):
+            await cache.get_or_load("key1", loader)
+        sizes = set()
+        for _ in range(50):
+            with pytest.raises(CodedError) as cached:
+                await cache.get_or_load("key1", loader)
+            assert cached.value.code == 503
+            sizes.add(len(traceback.extract_tb(cached.value.__traceback__)))
+        assert len(sizes) == 1
+
+    asyncio.run(scenario())
+
+
+def test_async_failures_not_cached_by_default():
+    calls = []
+
+    async def loader(key):
+        calls.append(key)
+        raise KeyError(key)
+
+    async def scenario():
+        cache = AsyncLRUCache(capacity=3, ttl_seconds=10)
+        for _ in range(2):
+            with pytest.raises(KeyError):
+                await cache.get_or_load("key1", loader)
+
+    asyncio.run(scenario())
+    assert calls == ["key1", "key1"]
+
+
+def test_async_cancelled_waiter_does_not_cancel_load():
+    async def loader(key):
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def scenario():
+        cache = AsyncLRUCache(capacity=3, ttl_seconds=10)
+        first = asyncio.ensure_future(cache.get_or_load("key1", loader))
+        second = asyncio.ensure_future(cache.get_or_load("key1", loader))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "value"
+        assert await cache.get("key1") == "value"
+
+    asyncio.run(scenario())
+
+
+# ============================================================================
+# Decorator Tests
+# ============================================================================
+
+
+def test_ttl_lru_cache_memoizes_calls():
+    calls = []
+
+    @ttl_lru_cache(capacity=2, ttl=10)
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    assert square(3) == 9
+    assert square(3) == 9
+    assert square(x=3) == 9
+    assert calls == [3, 3]
+    assert square.__name__ == "square"
+
+    info = square.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+
+
+def test_ttl_lru_cache_expires_entries():
+    clock = FakeClock()
+    calls = []
+
+    @ttl_lru_cache(capacity=2, ttl=5, clock=clock)
+    def load(key):
+        calls.append(key)
+        return key
+
+    load("a")
+    clock.advance(5)
+    load("a")
+    assert calls == ["a", "a"]
+
+
+def test_ttl_lru_cache_counts_evictions():
+    @ttl_lru_cache(capacity=2, ttl=10)
+    def identity(x):
+        return x
+
+    for x in [1, 2, 3, 1]:
+        identity(x)
+
+    info = identity.cache_info()
+    assert info.evictions == 2
+    assert info.currsize == 2
+    assert info.capacity == 2
+
+
+def test_ttl_lru_cache_typed_keys():
+    calls = []
+
+    @ttl_lru_cache(capacity=4, ttl=10, typed=True)
+    def describe(x):
+        calls.append(x)
+        return type(x).__name__
+
+    assert describe(1) == "int"
+    assert describe(1.0) == "float"
+    assert len(calls) == 2
+
+
+def test_ttl_lru_cache_caches_none_and_clears():
+    calls = []
+
+    @ttl_lru_cache(capacity=4, ttl=10)
+    def nothing(x):
+        calls.append(x)
+
+    nothing(1)
+    nothing(1)
+    assert calls == [1]
+
+    nothing.cache_clear()
+    assert nothing.cache_info() == (0, 0, 0, 4, 0)
+    nothing(1)
+    assert calls == [1, 1]
+
+
+# ============================================================================
+# Instrumentation Tests
+# ============================================================================
+
+
+def test_stats_count_hits_misses_and_inserts():
+    cache = LRUCache(capacity=3, ttl_seconds=10, record_stats=True)
+    cache.put("key1", "value1")
+    cache.put("key1", "value2")
+    cache.get("key1")
+    cache.get("missing")
+    cache.get_many(["key1", "missing"])
+
+    assert cache.stats() == CacheStats(hits=2, misses=2, inserts=1)
+
+
+def test_stats_separate_evictions_from_expiry():
+    clock = FakeClock()
+    cache = LRUCache(capacity=2, ttl_seconds=5, clock=clock, record_stats=True)
+    cache.put("key1", "value1")
+    cache.put("key2", "value2", ttl=1)
+    cache.put("key3", "value3", ttl=1)
+
+    clock.advance(1)
+    assert cache.get("key3") is None
+    cache.purge_expired()
+
+    stats = cache.stats()
+    assert stats.evictions == 1
+    assert stats.expired_on_read == 1
+    assert stats.expired_on_purge == 1
+    assert stats.misses == 1
+
+
+def test_stats_snapshot_and_reset():
+    cache = LRUCache(capacity=3, ttl_seconds=10, record_stats=True)
+    cache.get("missing")
+    snapshot = cache.stats()
+    cache.get("missing")
+
+    assert snapshot.misses == 1
+    assert cache.stats().misses == 2
+    cache.reset_stats()
+    assert cache.stats() == CacheStats()
+
+
+def test_stats_disabled_by_default():
+    cache = LRUCache(capacity=3, ttl_seconds=10)
+    cache.put("key1", "value1")
+    cache.get("key1")
+    assert cache.stats() == CacheStats()
+
+
+def test_on_evict_callback_reports_reason():
+    clock = FakeClock()
+    removed = []
+    cache = LRUCache(
+        capacity=2,
+        ttl_seconds=5,
+        clock=clock,
+        on_evict=lambda key, value, reason: removed.append((key, value, reason)),
+    )
+    cache.put("key1", "value1")
+    cache.put("key2", "value2")
+    cache.put("key3", "value3")
+    clock.advance(5)
+    cache.get("key2")
+    cache.purge_expired()
+
+    assert removed == [
+        ("key1", "value1", EVICTED),
+        ("key2", "value2", EXPIRED),
+        ("key3", "value3", EXPIRED),
+    ]
+
+
+# ============================================================================
+# Weighted Capacity Tests
+# ============================================================================
+
+
+def weigh_len(key, value):
+    return len(value)
+
+
+def test_weighted_cache_evicts_until_budget_fits():
+    cache = LRUCache(capacity=100, ttl_seconds=10, weigher=weigh_len, max_weight=10)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.put("c", "xx")
+    assert cache.total_weight == 10
+
+    cache.put("d", "xxxxxx")
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") == "xx"
+    assert cache.total_weight == 8
+
+
+def test_weighted_update_reweighs_entry():
+    cache = LRUCache(capacity=100, ttl_seconds=10, weigher=weigh_len, max_weight=10)
+    cache.put("a", "xxx")
+    cache.put("b", "xxx")
+    cache.put("b", "xxxxxxxx")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "xxxxxxxx"
+    assert cache.total_weight == 8
+
+
+def test_weighted_rejects_oversized_entry():
+    cache = LRUCache(capacity=100, ttl_seconds=10, weigher=weigh_len, max_weight=5)
+    cache.put("a", "xx")
+    cache.put("big", "x" * 6)
+    assert cache.get("big") is None
+    assert cache.get("a") == "xx"
+
+    cache.put("a", "x" * 6)
+    assert cache.get("a") is None
+    assert cache.total_weight == 0
+
+
+def test_weighted_entry_count_still_applies():
+    cache = LRUCache(capacity=2, ttl_seconds=10, weigher=weigh_len, max_weight=100)
+    cache.put_many({"a": "x", "b": "x", "c": "x"})
+    assert cache.size == 2
+    assert cache.total_weight == 2
+
+
+def test_weight_released_on_expiry():
+    clock = FakeClock()
+    cache = LRUCache(
+        capacity=10, ttl_seconds=1, clock=clock, weigher=weigh_len, max_weight=10
+    )
+    cache.put("a", "xxxxx")
+    clock.advance(1)
+    cache.purge_expired()
+    assert cache.total_weight == 0
+
+
+def test_weigher_requires_max_weight():
+    with pytest.raises(ValueError):
+        LRUCache(capacity=10, ttl_seconds=10, weigher=weigh_len)
+    with pytest.raises(ValueError):
+        LRUCache(capacity=10, ttl_seconds=10, max_weight=10)
+
+
+# ============================================================================
+# Scan-resistant Policy Tests
+# ============================================================================
+
+
+def test_count_min_sketch_estimates_and_halves():
+    sketch = CountMinSketch(width=64)
+    for _ in range(5):
+        sketch.increment("hot")
+    sketch.increment("cold")
+
+    assert sketch.estimate("hot") >= 5
+    assert sketch.estimate("cold") >= 1
+    assert sketch.estimate("hot") > sketch.estimate("cold")
+
+    for _ in range(100):
+        sketch.increment("hot")
+    assert sketch.estimate("hot") == CountMinSketch.MAX_COUNT
+    sketch.halve()
+    assert sketch.estimate("hot") == CountMinSketch.MAX_COUNT // 2
+
+
+def test_tinylfu_keeps_hot_keys_during_scan():
+    def hot_keys_left(cache):
+        for _ in range(5):
+            for i in range(50):
+                if cache.get(f"hot{i}") is None:
+                    cache.put(f"hot{i}", i)
+        for i in range(200):
+            if cache.get(f"scan{i}") is None:
+                cache.put(f"scan{i}", i)
+        return sum(f"hot{i}" in cache.cache for i in range(50))
+
+    assert hot_keys_left(LRUCache(capacity=50, ttl_seconds=10)) == 0
+    filtered = LRUCache(capacity=50, ttl_seconds=10, admission=TinyLFU(50))
+    assert hot_keys_left(filtered) >= 45
+
+
+@pytest.mark.parametrize("policy", ["lru", "slru"])
+def test_admission_keeps_hot_set_through_read_through_scan(policy):
+    # get() then put() on a miss is one access, so a one-off scan key must
+    # not look as popular as a hot key that was read twice.
+    def make(admission):
+        if policy == "lru":
+            return LRUCache(capacity=100, ttl_seconds=10, admission=admission)
+        return SegmentedLRUCache(capacity=100, ttl_seconds=10, admission=admission)
+
+    def read_through(cache, key):
+        if cache.get(key) is None:
+            cache.put(key, key)
+
+    rng = random.Random(4)
+    weights = [1 / rank for rank in range(1, 1001)]
+    warmup = rng.choices(range(1000), weights=weights, k=5000)
+    # Int keys hash the same in every process, so the sketch is deterministic.
+    scan = list(range(10_000, 11_000))
+    hot = set(range(20))
+
+    def hot_keys_left(cache):
+        for key in warmup + scan:
+            read_through(cache, key)
+        if policy == "lru":
+            keys = set(cache.cache)
+        else:
+            keys = set(cache.probation.cache) | set(cache.protected.cache)
+        return len(hot & keys)
+
+    if policy == "lru":
+        assert hot_keys_left(make(None)) == 0
+    assert hot_keys_left(make(TinyLFU(100))) >= 18
+
+
+def test_tinylfu_counts_read_through_once():
+    admission = TinyLFU(100)
+    cache = LRUCache(capacity=100, ttl_seconds=10, admission=admission)
+    assert cache.get("k") is None
+    cache.put("k", 1)
+    assert admission.sketch.estimate("k") == 1
+    # A write nobody read first is an access of its own.
+    cache.put("w", 1)
+    assert admission.sketch.estimate("w") == 1
+
+
+def test_tinylfu_admits_when_not_full():
+    cache = LRUCache(capacity=3, ttl_seconds=10, admission=TinyLFU(3))
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.size == 2
+
+
+def test_segmented_cache_basic_operations():
+    cache = SegmentedLRUCache(capacity=4, ttl_seconds=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("a", 10)
+    assert cache.get("a") == 10
+    assert cache.get("missing") is None
+    assert cache.size == 2
+
+
+def test_segmented_cache_promotes_on_second_access():
+    cache = SegmentedLRUCache(capacity=5, ttl_seconds=10)
+    cache.put("a", 1)
+    assert "a" in cache.probation.cache
+
+    cache.get("a")
+    assert "a" in cache.protected.cache
+    assert "a" not in cache.probation.cache
+
+
+def test_segmented_cache_survives_scan():
+    cache = SegmentedLRUCache(capacity=10, ttl_seconds=10)
+    hot = [f"hot{i}" for i in range(6)]
+    for key in hot:
+        cache.put(key, key)
+        cache.get(key)
+
+    for i in range(100):
+        cache.put(f"scan{i}", i)
+
+    assert all(cache.get(key) == key for key in hot)
+    assert cache.size == 10
+
+
+def test_segmented_cache_demotes_protected_overflow():
+    cache = SegmentedLRUCache(capacity=4, ttl_seconds=10, protected_ratio=0.5)
+    for key in ["a", "b", "c"]:
+        cache.put(key, key)
+        cache.get(key)
+
+    assert list(cache.protected.cache) == ["b", "c"]
+    assert "a" in cache.probation.cache
+    assert cache.size == 3
+
+
+def test_segmented_cache_expires_entries():
+    clock = FakeClock()
+    cache = SegmentedLRUCache(capacity=4, ttl_seconds=1, clock=clock)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.put("b", 2)
+
+    clock.advance(1)
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+# ============================================================================
+# Snapshot Tests
+# ============================================================================
+
+
+def test_dump_and_load_preserve_recency_and_ttl(tmp_path):
+    clock = FakeClock()
+    cache = LRUCache(capacity=5, ttl_seconds=10, clock=clock)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl=30)
+    cache.put("c", 3)
+    cache.get("a")
+    clock.advance(4)
+    path = tmp_path / "cache.snap"
+    assert cache.dump(path) == 3
+
+    restored = LRUCache(capacity=5, ttl_seconds=10, clock=FakeClock(100))
+    assert restored.load(path) == 3
+    assert recency(restored) == recency(cache)
+    restored.clock.advance(6.5)
+    assert restored.get("a") is None
+    assert restored.get("b") == 2
+    # The original TTL is kept for later refreshes.
+    assert restored.cache["b"].item.ttl_seconds == 30
+
+
+def test_dump_skips_expired_entries(tmp_path):
+    clock = FakeClock()
+    cache = LRUCache(capacity=5, ttl_seconds=10, clock=clock)
+    cache.put("old", 1)
+    clock.advance(6)
+    cache.put("new", 2)
+    clock.advance(5)
+    path = tmp_path / "cache.snap"
+    assert cache.dump(path) == 1
+
+    restored = LRUCache(capacity=5, ttl_seconds=10)
+    restored.load(path)
+    assert recency(restored) == ["new"]
+
+
+def test_load_subtracts_time_spent_on_disk(tmp_path, monkeypatch):
+    cache = LRUCache(capacity=5, ttl_seconds=10, clock=FakeClock())
+    cache.put("short", 1, ttl=5)
+    cache.put("long", 2, ttl=60)
+    path = tmp_path / "cache.snap"
+    cache.dump(path)
+
+    later = time.time() + 30
+    monkeypatch.setattr(time, "time", lambda: later)
+    restored = LRUCache(capacity=5, ttl_seconds=10, clock=FakeClock())
+    assert restored.load(path) == 1
+    assert restored.get("short") is None
+    assert restored.cache["long"].item.expiry_time == pytest.approx(30, abs=1)
+
+
+def test_load_keeps_most_recent_entries_when_smaller(tmp_path):
+    cache = LRUCache(capacity=5, ttl_seconds=10)
+    for key in "abcde":
+        cache.put(key, key)
+    path = tmp_path / "cache.snap"
+    cache.dump(path)
+
+    restored = LRUCache(capacity=2, ttl_seconds=10, compact=True)
+    assert restored.load(path) == 2
+    assert recency(restored) == ["e", "d"]
+    restored.put("f", "f")
+    assert recency(restored) == ["f", "e"]
+
+
+def test_load_into_populated_cache(tmp_path):
+    cache = LRUCache(capacity=3, ttl_seconds=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    path = tmp_path / "cache.snap"
+    cache.dump(path)
+
+    target = LRUCache(capacity=3, ttl_seconds=10)
+    target.put("a", 0)
+    target.put("z", 26)
+    assert target.load(path) == 2
+    assert recency(target) == ["b", "a", "z"]
+    assert target.get("a") == 1
+
+
+def test_load_rejects_foreign_file(tmp_path):
+    path = tmp_path / "cache.snap"
+    path.write_bytes(b"not a snapshot")
+    with pytest.raises(ValueError):
+        LRUCache(capacity=3, ttl_seconds=10).load(path)
+
+
+# ============================================================================
+# Shared-memory Cache Tests
+# ============================================================================
+
+
+@pytest.fixture
+def shared_cache():
+    clock = FakeClock()
+    cache = SharedLRUCache(
+        f"lru-{uuid.uuid4().hex[:12]}",
+        capacity=3,
+        ttl_seconds=10,
+        key_size=8,
+        value_size=16,
+        clock=clock,
+    )
+    cache.fake_clock = clock
+    yield cache
+    cache.close()
+    cache.unlink()
+
+
+def test_shared_cache_put_get_and_evict(shared_cache):
+    for key in (b"a", b"b", b"c"):
+        shared_cache.put(key, key * 2)
+    assert shared_cache.get(b"a") == b"aa"
+    shared_cache.put(b"d", b"dd")
+    assert shared_cache.get(b"b") is None
+    assert shared_cache.keys() == [b"d", b"a", b"c"]
+    assert shared_cache.size == 3
+
+
+def test_shared_cache_update_and_pop(shared_cache):
+    shared_cache.put(b"a", b"short")
+    shared_cache.put(b"a", b"much longer")
+    assert shared_cache.get(b"a") == b"much longer"
+    assert shared_cache.pop(b"a") == b"much longer"
+    assert shared_cache.get(b"a") is None
+    assert shared_cache.size == 0
+
+
+def test_shared_cache_expiry(shared_cache):
+    shared_cache.put(b"a", b"1")
+    shared_cache.put(b"b", b"2", ttl=30)
+    shared_cache.fake_clock.advance(11)
+    assert shared_cache.get(b"a") is None
+    assert shared_cache.get(b"b") == b"2"
+    assert shared_cache.size == 1
+
+
+def test_shared_cache_reuses_slots(shared_cache):
+    for i in range(50):
+        shared_cache.put(b"k%d" % i, b"v%d" % i)
+        if i % 3 == 0:
+            shared_cache.pop(b"k%d" % i)
+    assert shared_cache.keys() == [b"k49", b"k47", b"k46"]
+    assert [shared_cache.get(b"k%d" % i) for i in (46, 47, 49)] == [
+        b"v46",
+        b"v47",
+        b"v49",
+    ]
+
+
+def test_shared_cache_rejects_oversized_entries(shared_cache):
+    with pytest.raises(ValueError):
+        shared_cache.put(b"x" * 9, b"v")
+    with pytest.raises(ValueError):
+        shared_cache.put(b"k", b"v" * 17)
+
+
+def _shared_cache_worker(name, worker):
+    cache = SharedLRUCache(name, create=False)
+    for i in range(200):
+        cache.put(b"w%d-%d" % (worker, i), b"%d" % i)
+    cache.close()
+
+
+def test_shared_cache_is_shared_between_processes():
+    name = f"lru-{uuid.uuid4().hex[:12]}"
+    cache = SharedLRUCache(name, capacity=1000, ttl_seconds=60)
+    try:
+        ctx = multiprocessing.get_context("fork")
+        workers = [
+            ctx.Process(target=_shared_cache_worker, args=(name, worker))
+            for worker in range(4)
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+            assert process.exitcode == 0
+        assert cache.size == 800
+        assert cache.get(b"w3-199") == b"199"
+        assert len(set(cache.keys())) == 800
+    finally:
+        cache.close()
+        cache.unlink()
+
+
+def test_file_locks_on_one_path_share_one_lock_per_process(tmp_path):
+    path = str(tmp_path / "cache.lock")
+    first, second = FileLock(path), FileLock(path)
+    with first:
+        # A second handle in the same process must wait, not re-enter.
+        assert not second._thread_lock.acquire(blocking=False)
+    first.close()
+    # Closing one handle leaves the shared fd open for the other.
+    with second:
+        pass
+    second.close()
+
+
+# ============================================================================
+# Lazy Promotion Tests
+# ============================================================================
+
+
+def test_lazy_promotion_reads_do_not_reorder():
+    cache = LRUCache(capacity=3, ttl_seconds=10, lazy_promotion=True)
+    for key in "abc":
+        cache.put(key, key)
+    assert cache.get("a") == "a"
+    assert cache.get_many(["b"]) == {"b": "b"}
+    assert recency(cache) == ["c", "b", "a"]
+    assert cache.cache["a"].referenced
+
+
+def test_lazy_promotion_gives_referenced_entries_a_second_chance():
+    cache = LRUCache(capacity=3, ttl_seconds=10, lazy_promotion=True)
+    for key in "abc":
+        cache.put(key, key)
+    cache.get("a")
+    cache.put("d", "d")
+    assert cache.get("b") is None
+    assert recency(cache) == ["d", "a", "c"]
+    assert not cache.cache["a"].referenced
+    # "a" used its second chance, so it goes after "c" unless read again.
+    cache.put("e", "e")
+    cache.put("f", "f")
+    assert recency(cache) == ["f", "e", "d"]
+
+
+def test_lazy_promotion_all_referenced_evicts_oldest():
+    cache = LRUCache(capacity=3, ttl_seconds=10, compact=True, lazy_promotion=True)
+    for key in "abc":
+        cache.put(key, key)
+    for key in "cba":
+        cache.get(key)
+    cache.put("d", "d")
+    assert "a" not in cache.cache
+    assert recency(cache) == ["d", "c", "b"]
+
+
+def test_lazy_promotion_refreshes_ttl_on_read():
+    clock = FakeClock()
+    cache = LRUCache(capacity=3, ttl_seconds=10, clock=clock, lazy_promotion=True)
+    cache.put("a", 1)
+    clock.advance(8)
+    assert cache.get("a") == 1
+    clock.advance(8)
+    assert cache.get("a") == 1
+
+
+# ============================================================================
+# Expiry Mode Tests
+# ============================================================================
+
+
+def test_absolute_expiry_ignores_reads():
+    clock = FakeClock()
+    cache = LRUCache(capacity=3, ttl_seconds=10, clock=clock, expiry_mode=ABSOLUTE)
+    cache.put("a", 1)
+    clock.advance(8)
+    assert cache.get("a") == 1
+    assert cache.get_many(["a"]) == {"a": 1}
+    clock.advance(3)
+    assert cache.get("a") is None
+
+
+def test_absolute_expiry_restarts_on_write():
+    clock = FakeClock()
+    cache = LRUCache(capacity=3, ttl_seconds=10, clock=clock, expiry_mode=ABSOLUTE)
+    cache.put("a", 1)
+    clock.advance(8)
+    cache.put("a", 2)
+    clock.advance(8)
+    assert cache.get("a") == 2
+
+
+def test_absolute_expiry_still_tracks_recency():
+    cache = LRUCache(capacity=2, ttl_seconds=10, expiry_mode=ABSOLUTE)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert recency(cache) == ["c", "a"]
+
+
+def test_unknown_expiry_mode_rejected():
+    with pytest.raises(ValueError):
+        LRUCache(capacity=3, ttl_seconds=10, expiry_mode="idle")
+
+
+def test_peek_does_not_refresh_or_reorder():
+    clock = FakeClock()
+    cache = LRUCache(capacity=3, ttl_seconds=10, clock=clock, record_stats=True)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    clock.advance(8)
+    assert cache.peek("a") == 1
+    assert cache.peek("missing", "default") == "default"
+    assert recency(cache) == ["b", "a"]
+    assert cache.stats().hits == 0
+    assert cache.stats().misses == 0
+    clock.advance(3)
+    assert cache.peek("a") is None
+
+
+def test_sharded_peek():
+    cache = ShardedLRUCache(capacity=64, ttl_seconds=10, shards=4)
+    cache.put("a", 1)
+    assert cache.peek("a") == 1
+    assert cache.peek("b") is None
+
+
+# ============================================================================
+# Refresh-ahead Tests
+# ============================================================================
+
+
+class DeferredExecutor(Executor):
+    # Queues submitted reloads until run() so tests control when they happen.
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, fn, *args):
+        self.pending.append((fn, args))
+
+    def run(self):
+        pending, self.pending = self.pending, []
+        for fn, args in pending:
+            fn(*args)
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self, key):
+        if self.fail:
+            raise RuntimeError("backend down")
+        self.calls += 1
+        return f"{key}-{self.calls}"
+
+
+def refresh_cache(loader, clock, executor, **kwargs):
+    return RefreshAheadCache(
+        loader, capacity=10, ttl_seconds=10, clock=clock, executor=executor, **kwargs
+    )
+
+
+def test_refresh_ahead_loads_miss_synchronously():
+    loader, executor = CountingLoader(), DeferredExecutor()
+    cache = refresh_cache(loader, FakeClock(), executor)
+    assert cache.get("a") == "a-1"
+    assert cache.get("a") == "a-1"
+    assert loader.calls == 1
+    assert executor.pending == []
+
+
+def test_refresh_ahead_serves_cached_value_while_reloading():
+    clock, loader, executor = FakeClock(), CountingLoader(), DeferredExecutor()
+    cache = refresh_cache(loader, clock, executor, refresh_ratio=0.5)
+    cache.get("a")
+    clock.advance(6)
+    assert cache.get("a") == "a-1"
+    assert cache.get("a") == "a-1"
+    assert len(executor.pending) == 1
+    executor.run()
+    assert cache.get("a") == "a-2"
+    assert cache.refreshes == 1
+    # The reload restarted the TTL.
+    clock.advance(9)
+    assert cache.get("a") == "a-2"
+    assert loader.calls == 2
+
+
+def test_stale_value_served_within_grace():
+    clock, loader, executor = FakeClock(), CountingLoader(), DeferredExecutor()
+    cache = refresh_cache(loader, clock, executor, stale_grace=5)
+    cache.get("a")
+    clock.advance(12)
+    assert cache.get("a") == "a-1"
+    assert cache.stale_hits == 1
+    assert len(executor.pending) == 1
+
+
+def test_entry_past_grace_is_reloaded_synchronously():
+    clock, loader, executor = FakeClock(), CountingLoader(), DeferredExecutor()
+    cache = refresh_cache(loader, clock, executor, stale_grace=5)
+    cache.get("a")
+    clock.advance(16)
+    assert cache.get("a") == "a-2"
+    assert executor.pending == []
+
+
+def test_failed_refresh_keeps_stale_value():
+    clock, loader, executor = FakeClock(), CountingLoader(), DeferredExecutor()
+    cache = refresh_cache(loader, clock, executor, stale_grace=5)
+    cache.get("a")
+    clock.advance(11)
+    loader.fail = True
+    assert cache.get("a") == "a-1"
+    executor.run()
+    assert cache.get("a") == "a-1"
+    assert cache.refreshes == 0
+
+
+def test_refresh_does_not_restore_invalidated_or_overwritten_key():
+    clock, loader, executor = FakeClock(), CountingLoader(), DeferredExecutor()
+    cache = refresh_cache(loader, clock, executor, refresh_ratio=0.5)
+    cache.get("a")
+    cache.get("b")
+    clock.advance(6)
+    cache.get("a")
+    cache.get("b")
+    cache.invalidate("a")
+    cache.put("b", "fresh")
+    executor.run()
+    assert cache.size == 1
+    assert cache.get("b") == "fresh"
+    assert cache.refreshes == 0
+    # A later hit can schedule a new reload for the key.
+    clock.advance(6)
+    cache.get("b")
+    assert len(executor.pending) == 1
+
+
+def test_refresh_ahead_get_after_close_serves_cached_value():
+    clock, loader = FakeClock(), CountingLoader()
+    cache = RefreshAheadCache(loader, capacity=10, ttl_seconds=10, clock=clock)
+    cache.get("a")
+    cache.close()
+    clock.advance(9)
+    assert cache.get("a") == "a-1"
+    assert cache.get("a") == "a-1"
+    assert loader.calls == 1
+
+
+def test_refresh_ahead_with_thread_pool():
+    clock, loader = FakeClock(), CountingLoader()
+    with RefreshAheadCache(loader, capacity=10, ttl_seconds=10, clock=clock) as cache:
+        cache.get("a")
+        clock.advance(9)
+        assert cache.get("a") == "a-1"
+    assert cache.get("a") == "a-2"
+
+
+def test_refresh_ratio_validated():
+    with pytest.raises(ValueError):
+        RefreshAheadCache(
+            CountingLoader(), capacity=10, ttl_seconds=10, refresh_ratio=0
+        )
+
+
+# ============================================================================
+# Tiered Cache Tests
+# ============================================================================
+
+
+@pytest.fixture
+def tiered(tmp_path):
+    clock = FakeClock()
+    cache = TieredLRUCache(2, 10, tmp_path / "tier.log", clock=clock)
+    cache.fake_clock = clock
+    yield cache
+    cache.close()
+
+
+def test_tiered_demotes_evicted_entries(tiered):
+    for key in "abc":
+        tiered.put(key, key.upper())
+    assert "a" not in tiered.cache
+    assert tiered.disk.size == 1
+    assert tiered.get("a") == "A"
+    assert (tiered.memory_hits, tiered.disk_hits) == (0, 1)
+    # Promoting "a" demoted the new LRU entry.
+    assert recency(tiered) == ["a", "c"]
+    assert list(tiered.disk.index) == ["b"]
+
+
+def test_tiered_keeps_remaining_ttl(tiered):
+    tiered.put("a", 1)
+    tiered.fake_clock.advance(6)
+    tiered.put("b", 2)
+    tiered.put("c", 3)
+    assert tiered.get("a") == 1
+    assert tiered.cache["a"].item.expiry_time == 10
+    tiered.fake_clock.advance(5)
+    assert tiered.peek("a") is None
+
+
+def test_tiered_skips_expired_disk_entries(tiered):
+    for key in "abc":
+        tiered.put(key, key)
+    tiered.fake_clock.advance(11)
+    assert tiered.get("a") is None
+    assert tiered.misses == 1
+    assert tiered.disk.size == 0
+
+
+def test_tiered_put_replaces_disk_copy(tiered):
+    for key in "abc":
+        tiered.put(key, key)
+    tiered.put("a", "new")
+    assert "a" not in tiered.disk.index
+    assert tiered.get("a") == "new"
+    assert tiered.pop("b") == "b"
+    assert tiered.get("b") is None
+
+
+def test_tiered_keeps_disk_copy_when_promotion_is_refused(tmp_path):
+    cache = TieredLRUCache(2, 10, tmp_path / "tier.log")
+    for key in "abc":
+        cache.put(key, key.upper())
+    assert list(cache.disk.index) == ["a"]
+    cache.admission = TinyLFU(2)
+    for _ in range(5):
+        cache.get("b")
+        cache.get("c")
+    # TinyLFU refuses "a" in memory both times; the disk copy still serves it.
+    assert cache.get("a") == "A"
+    assert cache.get("a") == "A"
+    assert "a" not in cache.cache
+    cache.close()
+
+
+def test_tiered_get_many_checks_disk(tiered):
+    tiered.put_many({"a": 1, "b": 2})
+    tiered.put_many({"c": 3})
+    assert tiered.get_many(["a", "c", "z"]) == {"a": 1, "c": 3}
+
+
+def test_disk_tier_bounds_bytes_and_compacts(tmp_path):
+    cache = TieredLRUCache(1, 10, tmp_path / "tier.log", max_disk_bytes=500)
+    cache.disk.MIN_COMPACT_BYTES = 0
+    for i in range(100):
+        cache.put(i, "x" * 50)
+    disk = cache.disk
+    assert disk.live_bytes <= 500
+    assert disk.compactions > 0
+    assert disk.file_bytes <= 2 * 500 + 100
+    assert cache.get(98) == "x" * 50
+    assert cache.get(0) is None
+    cache.close()
+
+
+def test_disk_tier_compact_drops_expired(tiered):
+    for key in "ab":
+        tiered.put(key, key)
+    tiered.fake_clock.advance(5)
+    for key in "cdef":
+        tiered.put(key, key)
+    tiered.fake_clock.advance(6)
+    tiered.compact()
+    assert list(tiered.disk.index) == ["c", "d"]
+    assert tiered.get("d") == "d"
+
+
+def test_tiered_invalidation_purges_disk(tmp_path):
+    cache = TieredLRUCache(
+        2, 100, tmp_path / "tier.log", key_prefix=lambda key: key.split(":")[0]
+    )
+    for key in ("t1:a", "t1:b", "t2:c", "t2:d"):
+        cache.put(key, key.upper())
+    assert list(cache.disk.index) == ["t1:a", "t1:b"]
+    assert cache.invalidate_prefix("t1") == 2
+    assert cache.get("t1:a") is None
+    assert cache.get("t1:b") is None
+    cache.put("t3:e", "drop")
+    assert list(cache.disk.index) == ["t2:c"]
+    assert cache.invalidate_where(lambda key, value: value == "T2:C") == 1
+    assert cache.get("t2:c") is None
+    assert cache.get("t2:d") == "T2:D"
+    cache.close()
+
+
+# ============================================================================
+# Iteration and Invalidation Tests
+# ============================================================================
+
+
+def test_items_iterate_in_recency_order_skipping_expired():
+    clock = FakeClock()
+    cache = LRUCache(capacity=5, ttl_seconds=10, clock=clock)
+    cache.put("a", 1)
+    clock.advance(6)
+    cache.put("b", 2)
+    cache.put("c", 3)
+    cache.get("b")
+    assert list(cache.items()) == [("b", 2), ("c", 3), ("a", 1)]
+    assert list(cache.keys(reverse=True)) == ["a", "c", "b"]
+    clock.advance(5)
+    assert list(cache) == ["b", "c"]
+    assert list(cache.values(reverse=True)) == [3, 2]
+    # Iterating neither reorders nor removes anything.
+    assert recency(cache) == ["b", "c", "a"]
+
+
+def test_items_is_lazy():
+    cache = LRUCache(capacity=5, ttl_seconds=10)
+    for key in "abc":
+        cache.put(key, key)
+    entries = cache.items()
+    assert next(entries) == ("c", "c")
+
+
+def test_invalidate_where():
+    events = []
+    cache = LRUCache(
+        capacity=10,
+        ttl_seconds=10,
+        on_evict=lambda *event: events.append(event),
+    )
+    for i in range(6):
+        cache.put(i, i * 10)
+    assert cache.invalidate_where(lambda key, value: key % 2 == 0) == 3
+    assert recency(cache) == [5, 3, 1]
+    assert events == []
+    cache.put(6, 60)
+    assert cache.size == 4
+
+
+def test_clear_empties_cache_and_keeps_working():
+    cache = LRUCache(capacity=3, ttl_seconds=10, record_stats=True)
+    for key in "abc":
+        cache.put(key, key)
+    cache.clear()
+    assert cache.size == 0
+    assert cache.head is None and cache.tail is None
+    assert cache.purge_expired() == 0
+    assert cache.stats().inserts == 3
+    cache.put("d", "d")
+    assert recency(cache) == ["d"]
+
+
+def test_invalidate_prefix():
+    cache = LRUCache(
+        capacity=10, ttl_seconds=10, key_prefix=lambda key: key.split(":")[0]
+    )
+    cache.put_many({"t1:a": 1, "t2:a": 2, "t1:b": 3})
+    cache.put("t3:a", 4)
+    assert cache.invalidate_prefix("t1") == 2
+    assert recency(cache) == ["t3:a", "t2:a"]
+    assert cache.invalidate_prefix("t1") == 0
+    cache.clear()
+    cache.put("t1:c", 5)
+    assert cache.invalidate_prefix("t1") == 1
+    assert cache.size == 0
+
+
+def test_prefix_index_follows_evictions():
+    cache = LRUCache(capacity=2, ttl_seconds=10, key_prefix=lambda key: key[0])
+    for key in ("a1", "a2", "b1"):
+        cache.put(key, key)
+    assert cache.invalidate_prefix("a") == 1
+    assert list(cache) == ["b1"]
+
+
+def test_invalidate_prefix_requires_index():
+    cache = LRUCache(capacity=2, ttl_seconds=10)
+    with pytest.raises(ValueError):
+        cache.invalidate_prefix("a")
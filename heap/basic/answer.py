@@ -1,6 +1,14 @@
+from array import array
+
+
 class MinHeap:
-    def __init__(self, values=None):
-        """Create a min-heap from optional initial values (heapified in-place)."""
+    def __init__(self, values=None, validate=True):
+        """
+        Create a min-heap from optional initial values (heapified in-place).
+        validate=False skips the per-push comparability check for trusted,
+        homogeneous data; a bad value then fails mid-sift instead.
+        """
+        self._validate = validate
         self._heap = [] if values is None else list(values)
         if self._heap:
             try:
@@ -69,7 +77,8 @@ class MinHeap:
 
     def push(self, value):
         """Insert a value and restore the heap by bubbling up."""
-        self._ensure_comparable(value)
+        if self._validate:
+            self._ensure_comparable(value)
         self._heap.append(value)
         self._bubble_up(len(self._heap) - 1)
 
@@ -83,6 +92,61 @@ class MinHeap:
             self._sift_down(0)
         return value
 
+    def push_many(self, values):
+        """
+        Insert every value from an iterable. When the batch is large relative
+        to the heap, k bubble-ups (k log n) cost more than rebuilding the
+        whole array with _heapify (about 2n comparisons), so the batch is
+        appended and the heap rebuilt; otherwise values are pushed one by one.
+        """
+        values = list(values)
+        total = len(self._heap) + len(values)
+        if len(values) * total.bit_length() <= 2 * total:
+            for value in values:
+                self.push(value)
+            return
+        old = self._heap
+        self._heap = old + values
+        try:
+            self._heapify()
+        except TypeError as exc:
+            self._heap = old
+            raise TypeError("Heap items must be mutually comparable") from exc
+
+    def pop_many(self, k):
+        """Remove and return the smallest k items in order; raise if fewer."""
+        if k < 0:
+            raise ValueError("k cannot be negative")
+        if k > len(self._heap):
+            raise IndexError("Heap has fewer than k items")
+        return [self.pop() for _ in range(k)]
+
+    def pushpop(self, value):
+        """
+        Push value, then pop and return the smallest item, with one sift. If
+        value would be popped straight back, the heap is not touched at all.
+        """
+        if self._validate:
+            self._ensure_comparable(value)
+        if self._heap and self._heap[0] < value:
+            value, self._heap[0] = self._heap[0], value
+            self._sift_down(0)
+        return value
+
+    def replace(self, value):
+        """
+        Pop and return the smallest item, then push value, with one sift. Unlike
+        pushpop, the returned item may be larger than value. Raise if empty.
+        """
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        if self._validate:
+            self._ensure_comparable(value)
+        top = self._heap[0]
+        self._heap[0] = value
+        self._sift_down(0)
+        return top
+
     def peek(self):
         """Return the smallest item without removing it; raise if empty."""
         if self.is_empty():
@@ -99,8 +163,13 @@ class MinHeap:
 
 
 class MaxHeap:
-    def __init__(self, values=None):
-        """Create a max-heap from optional initial values (heapified in-place)."""
+    def __init__(self, values=None, validate=True):
+        """
+        Create a max-heap from optional initial values (heapified in-place).
+        validate=False skips the per-push comparability check for trusted,
+        homogeneous data; a bad value then fails mid-sift instead.
+        """
+        self._validate = validate
         self._heap = [] if values is None else list(values)
         if self._heap:
             try:
@@ -164,7 +233,8 @@ class MaxHeap:
 
     def push(self, value):
         """Insert a value and restore the heap by bubbling up."""
-        self._ensure_comparable(value)
+        if self._validate:
+            self._ensure_comparable(value)
         self._heap.append(value)
         self._bubble_up(len(self._heap) - 1)
 
@@ -178,6 +248,61 @@ class MaxHeap:
             self._sift_down(0)
         return value
 
+    def push_many(self, values):
+        """
+        Insert every value from an iterable. When the batch is large relative
+        to the heap, k bubble-ups (k log n) cost more than rebuilding the
+        whole array with _heapify (about 2n comparisons), so the batch is
+        appended and the heap rebuilt; otherwise values are pushed one by one.
+        """
+        values = list(values)
+        total = len(self._heap) + len(values)
+        if len(values) * total.bit_length() <= 2 * total:
+            for value in values:
+                self.push(value)
+            return
+        old = self._heap
+        self._heap = old + values
+        try:
+            self._heapify()
+        except TypeError as exc:
+            self._heap = old
+            raise TypeError("Heap items must be mutually comparable") from exc
+
+    def pop_many(self, k):
+        """Remove and return the largest k items in order; raise if fewer."""
+        if k < 0:
+            raise ValueError("k cannot be negative")
+        if k > len(self._heap):
+            raise IndexError("Heap has fewer than k items")
+        return [self.pop() for _ in range(k)]
+
+    def pushpop(self, value):
+        """
+        Push value, then pop and return the largest item, with one sift. If
+        value would be popped straight back, the heap is not touched at all.
+        """
+        if self._validate:
+            self._ensure_comparable(value)
+        if self._heap and self._heap[0] > value:
+            value, self._heap[0] = self._heap[0], value
+            self._sift_down(0)
+        return value
+
+    def replace(self, value):
+        """
+        Pop and return the largest item, then push value, with one sift. Unlike
+        pushpop, the returned item may be smaller than value. Raise if empty.
+        """
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        if self._validate:
+            self._ensure_comparable(value)
+        top = self._heap[0]
+        self._heap[0] = value
+        self._sift_down(0)
+        return top
+
     def peek(self):
         """Return the largest item without removing it; raise if empty."""
         if self.is_empty():
@@ -191,3 +316,548 @@ class MaxHeap:
     def is_empty(self):
         """Return True when the heap has no items."""
         return len(self._heap) == 0
+
+
+class Heap:
+    """
+    One heap engine for both orders. Heap() behaves like MinHeap and
+    Heap(reverse=True) like MaxHeap. `key` maps each value to the priority it
+    is ordered by, computed once on insert and cached in a parallel array, so
+    sifting compares plain keys instead of (priority, seq, obj) tuples. Equal
+    keys come out in insertion order.
+    """
+
+    def __init__(self, values=None, key=None, reverse=False, validate=True):
+        """
+        Create a heap from optional initial values (heapified in O(n)).
+        validate=False skips the per-push key check, as in MinHeap.
+        """
+        self._validate = validate
+        self._key = key
+        self._reverse = reverse
+        self._heap = [] if values is None else list(values)
+        self._keys = self._heap[:] if key is None else [key(v) for v in self._heap]
+        self._seqs = list(range(len(self._heap)))
+        self._seq = len(self._heap)
+        if self._heap:
+            try:
+                self._heapify()
+            except TypeError as exc:
+                raise TypeError("Heap keys must be mutually comparable") from exc
+
+    def _heapify(self):
+        """Bottom-up heapify over the key array, as in MinHeap._heapify."""
+        for idx in range((len(self._heap) - 2) // 2, -1, -1):
+            self._sift_down(idx)
+
+    def _sift_down(self, idx):
+        """
+        Move the entry at idx down. Rather than swapping at every level, the
+        entry is lifted out and children are shifted up into the hole until
+        its slot is found, so each level costs one move and the values, keys
+        and seqs arrays stay aligned.
+        """
+        values, keys, seqs = self._heap, self._keys, self._seqs
+        reverse = self._reverse
+        n = len(keys)
+        value, key, seq = values[idx], keys[idx], seqs[idx]
+        while True:
+            child = 2 * idx + 1
+            if child >= n:
+                break
+            right = child + 1
+            if right < n:
+                a, b = keys[right], keys[child]
+                if (a > b if reverse else a < b) or (
+                    a == b and seqs[right] < seqs[child]
+                ):
+                    child = right
+            child_key = keys[child]
+            if not (
+                (child_key > key if reverse else child_key < key)
+                or (child_key == key and seqs[child] < seq)
+            ):
+                break
+            values[idx], keys[idx], seqs[idx] = values[child], child_key, seqs[child]
+            idx = child
+        values[idx], keys[idx], seqs[idx] = value, key, seq
+
+    def _bubble_up(self, idx):
+        """Move the entry at idx up, shifting parents down into the hole."""
+        values, keys, seqs = self._heap, self._keys, self._seqs
+        reverse = self._reverse
+        value, key, seq = values[idx], keys[idx], seqs[idx]
+        while idx > 0:
+            parent = (idx - 1) // 2
+            parent_key = keys[parent]
+            if not (
+                (key > parent_key if reverse else key < parent_key)
+                or (key == parent_key and seq < seqs[parent])
+            ):
+                break
+            values[idx], keys[idx], seqs[idx] = values[parent], parent_key, seqs[parent]
+            idx = parent
+        values[idx], keys[idx], seqs[idx] = value, key, seq
+
+    def _ensure_comparable(self, key):
+        """Fail fast if the new key cannot be compared with the root key."""
+        if not self._keys:
+            return
+        try:
+            _ = key < self._keys[0]
+            _ = self._keys[0] < key
+        except TypeError as exc:
+            raise TypeError("Heap keys must be mutually comparable") from exc
+
+    def push(self, value):
+        """Insert a value, computing its key once, and bubble it up."""
+        key = value if self._key is None else self._key(value)
+        if self._validate:
+            self._ensure_comparable(key)
+        self._heap.append(value)
+        self._keys.append(key)
+        self._seqs.append(self._seq)
+        self._seq += 1
+        self._bubble_up(len(self._heap) - 1)
+
+    def pop(self):
+        """Remove and return the first value in heap order; raise if empty."""
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        value = self._heap.pop()
+        key = self._keys.pop()
+        seq = self._seqs.pop()
+        if not self._heap:
+            return value
+        top = self._heap[0]
+        self._heap[0], self._keys[0], self._seqs[0] = value, key, seq
+        self._sift_down(0)
+        return top
+
+    def peek(self):
+        """Return the first value in heap order without removing it."""
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        return self._heap[0]
+
+    def __len__(self):
+        """Return number of items in the heap."""
+        return len(self._heap)
+
+    def is_empty(self):
+        """Return True when the heap has no items."""
+        return len(self._heap) == 0
+
+
+class IndexedPriorityQueue(MinHeap):
+    """
+    Min-priority queue addressed by handle. Entries are (priority, seq, handle)
+    tuples, so equal priorities pop in insertion order and handles are never
+    compared. A position map (handle -> heap index) is kept in sync by the
+    queue's own sift methods, which lets update_priority() and remove() find
+    an entry in O(1) and fix the heap with one sift in O(log n). MinHeap's
+    sifts stay free of that bookkeeping.
+    """
+
+    def __init__(self, items=None):
+        """Create a queue from optional (handle, priority) pairs or a mapping."""
+        if isinstance(items, dict):
+            items = items.items()
+        self._heap = []
+        self._positions = {}
+        self._seq = 0
+        for handle, priority in items or ():
+            if handle in self._positions:
+                raise ValueError(f"Duplicate handle: {handle!r}")
+            self._positions[handle] = len(self._heap)
+            self._heap.append((priority, self._seq, handle))
+            self._seq += 1
+        if self._heap:
+            try:
+                self._heapify()
+            except TypeError as exc:
+                raise TypeError("Priorities must be mutually comparable") from exc
+
+    def _sift_down(self, idx):
+        """
+        Move the entry at idx down, shifting smaller children up into the hole
+        and recording the new position of every entry that moves.
+        """
+        heap, positions = self._heap, self._positions
+        n = len(heap)
+        entry = heap[idx]
+        while True:
+            child = 2 * idx + 1
+            if child >= n:
+                break
+            right = child + 1
+            if right < n and heap[right] < heap[child]:
+                child = right
+            if not heap[child] < entry:
+                break
+            heap[idx] = heap[child]
+            positions[heap[idx][2]] = idx
+            idx = child
+        heap[idx] = entry
+        positions[entry[2]] = idx
+
+    def _bubble_up(self, idx):
+        """
+        Move the entry at idx up, shifting larger parents down into the hole
+        and recording the new position of every entry that moves.
+        """
+        heap, positions = self._heap, self._positions
+        entry = heap[idx]
+        while idx > 0:
+            parent = (idx - 1) // 2
+            if not entry < heap[parent]:
+                break
+            heap[idx] = heap[parent]
+            positions[heap[idx][2]] = idx
+            idx = parent
+        heap[idx] = entry
+        positions[entry[2]] = idx
+
+    def _ensure_comparable(self, priority):
+        """Fail fast if the priority cannot be compared with the root's."""
+        if not self._heap:
+            return
+        try:
+            _ = priority < self._heap[0][0]
+            _ = self._heap[0][0] < priority
+        except TypeError as exc:
+            raise TypeError("Priorities must be mutually comparable") from exc
+
+    def push(self, handle, priority):
+        """Insert a new handle; raise ValueError if it is already queued."""
+        if handle in self._positions:
+            raise ValueError(f"Duplicate handle: {handle!r}")
+        self._ensure_comparable(priority)
+        self._positions[handle] = len(self._heap)
+        self._heap.append((priority, self._seq, handle))
+        self._seq += 1
+        self._bubble_up(len(self._heap) - 1)
+
+    def pop(self):
+        """Remove and return (handle, priority) with the smallest priority."""
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        heap = self._heap
+        priority, _, handle = heap[0]
+        last = heap.pop()
+        if heap:
+            heap[0] = last
+            self._sift_down(0)
+        del self._positions[handle]
+        return handle, priority
+
+    def peek(self):
+        """Return (handle, priority) with the smallest priority."""
+        priority, _, handle = super().peek()
+        return handle, priority
+
+    def push_many(self, items):
+        """Queue every (handle, priority) pair; each one bubbles up."""
+        for handle, priority in items:
+            self.push(handle, priority)
+
+    def pushpop(self, handle, priority):
+        """
+        Queue handle, then pop and return the smallest (handle, priority),
+        with one sift. Equal priorities favour the entries already queued.
+        """
+        if self._heap and self._heap[0][0] <= priority:
+            return self.replace(handle, priority)
+        if handle in self._positions:
+            raise ValueError(f"Duplicate handle: {handle!r}")
+        return handle, priority
+
+    def replace(self, handle, priority):
+        """Pop and return the smallest (handle, priority), then queue handle."""
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        if handle in self._positions and self._positions[handle] != 0:
+            raise ValueError(f"Duplicate handle: {handle!r}")
+        self._ensure_comparable(priority)
+        top_priority, _, top_handle = self._heap[0]
+        del self._positions[top_handle]
+        self._heap[0] = (priority, self._seq, handle)
+        self._positions[handle] = 0
+        self._seq += 1
+        self._sift_down(0)
+        return top_handle, top_priority
+
+    def update_priority(self, handle, priority):
+        """
+        Change a handle's priority in O(log n). A smaller priority bubbles the
+        entry up (decrease-key), a larger one sifts it down. The entry keeps
+        its original sequence number, so ties still follow insertion order.
+        """
+        idx = self._positions[handle]
+        old_priority, seq, _ = self._heap[idx]
+        self._ensure_comparable(priority)
+        self._heap[idx] = (priority, seq, handle)
+        if priority < old_priority:
+            self._bubble_up(idx)
+        else:
+            self._sift_down(idx)
+
+    def remove(self, handle):
+        """
+        Remove a handle from anywhere in the heap and return its priority.
+        The last entry fills the hole and is then sifted whichever way it
+        needs to go, so this is O(log n). Raises KeyError if not queued.
+        """
+        idx = self._positions.pop(handle)
+        heap = self._heap
+        priority = heap[idx][0]
+        last = heap.pop()
+        if idx < len(heap):
+            heap[idx] = last
+            self._sift_down(idx)
+            self._bubble_up(idx)
+        return priority
+
+    def priority(self, handle):
+        """Return the current priority of a queued handle."""
+        return self._heap[self._positions[handle]][0]
+
+    def __contains__(self, handle):
+        """Return True when the handle is queued."""
+        return handle in self._positions
+
+
+class TopK:
+    """
+    Keeps the k largest items of a stream in a size-k MinHeap whose root is
+    the current cut-off, so memory stays O(k) however long the stream is.
+    Once full, an item that cannot enter is rejected with one comparison
+    against peek(), and one that can replaces the root with a single sift.
+    With `key`, heap entries are (key, -seq, item) so items are never
+    compared, and among equal keys the latest item sits nearest the root and
+    is evicted first: on equal keys the earlier item is kept.
+    """
+
+    def __init__(self, k, key=None):
+        """Create an empty selector for the k largest items (by key)."""
+        if k < 0:
+            raise ValueError("k cannot be negative")
+        self.k = k
+        self._key = key
+        self._heap = MinHeap()
+        self._seq = 0
+
+    def push(self, item):
+        """Offer one item; return True if it is now among the top k."""
+        if self._key is None:
+            return self._offer(item, item)
+        return self._offer(self._key(item), item)
+
+    def push_many(self, items):
+        """Offer every item from an iterable."""
+        for item in items:
+            self.push(item)
+
+    def _offer(self, key, item):
+        """Admit an item whose key is already known."""
+        heap = self._heap
+        full = len(heap) >= self.k
+        if full:
+            if self.k == 0:
+                return False
+            root = heap.peek()
+            if key <= (root if self._key is None else root[0]):
+                return False
+        entry = item if self._key is None else (key, -self._seq, item)
+        self._seq += 1
+        if full:
+            heap.replace(entry)
+        else:
+            heap.push(entry)
+        return True
+
+    def merge(self, other):
+        """
+        Fold in the items kept by another TopK with the same key function,
+        e.g. a partial result from a parallel worker. Cached keys are reused.
+        Returns self.
+        """
+        if self._key is None:
+            for entry in other._heap._heap:
+                self._offer(entry, entry)
+            return self
+        # In other's arrival order, so its earlier items still win ties.
+        entries = sorted(other._heap._heap, key=lambda entry: -entry[1])
+        for key, _, item in entries:
+            self._offer(key, item)
+        return self
+
+    def top(self):
+        """Return the kept items, largest first, without consuming them."""
+        entries = self._heap._heap
+        if self._key is None:
+            return sorted(entries, reverse=True)
+        entries = sorted(entries, key=lambda entry: entry[1], reverse=True)
+        entries.sort(key=lambda entry: entry[0], reverse=True)
+        return [item for _, _, item in entries]
+
+    def __len__(self):
+        """Return number of items kept (at most k)."""
+        return len(self._heap)
+
+
+class NumericHeap:
+    """
+    Min-heap of float priorities with int payloads, kept unboxed in two
+    parallel arrays: array('d') for priorities and array('q') for payloads,
+    16 bytes per entry instead of a list slot plus boxed objects. Priorities
+    and payloads can be handed over as buffers (an array, or bytes of native
+    doubles / int64s), which are copied in C before one O(n) heapify. NaN
+    priorities are not supported.
+    """
+
+    def __init__(self, priorities=None, payloads=None):
+        """
+        Build a heap from optional priorities and matching payloads. Without
+        payloads, each entry's payload is its index in `priorities`.
+        """
+        self._priorities = self._as_array("d", () if priorities is None else priorities)
+        if payloads is None:
+            payloads = range(len(self._priorities))
+        self._payloads = self._as_array("q", payloads)
+        if len(self._payloads) != len(self._priorities):
+            raise ValueError("Priorities and payloads must have the same length")
+        self._heapify()
+
+    @staticmethod
+    def _as_array(typecode, values):
+        """
+        Copy values into an array. Raw bytes, or a buffer already of this
+        typecode, are copied as raw items; a typed buffer of any other format
+        (e.g. memoryview of array('f') or array('i')) is converted by value.
+        """
+        if isinstance(values, (bytes, bytearray, memoryview)):
+            view = memoryview(values)
+            if view.format not in ("B", typecode):
+                return array(typecode, view.tolist())
+            result = array(typecode)
+            result.frombytes(view.cast("B"))
+            return result
+        return array(typecode, values)
+
+    def _heapify(self):
+        """Bottom-up heapify, as in MinHeap._heapify."""
+        for idx in range((len(self._priorities) - 2) // 2, -1, -1):
+            self._sift_down(idx)
+
+    def _sift_down(self, idx):
+        """Move the entry at idx down, shifting smaller children into the hole."""
+        priorities, payloads = self._priorities, self._payloads
+        n = len(priorities)
+        priority, payload = priorities[idx], payloads[idx]
+        while True:
+            child = 2 * idx + 1
+            if child >= n:
+                break
+            right = child + 1
+            if right < n and priorities[right] < priorities[child]:
+                child = right
+            if not priorities[child] < priority:
+                break
+            priorities[idx] = priorities[child]
+            payloads[idx] = payloads[child]
+            idx = child
+        priorities[idx] = priority
+        payloads[idx] = payload
+
+    def _bubble_up(self, idx):
+        """Move the entry at idx up, shifting larger parents into the hole."""
+        priorities, payloads = self._priorities, self._payloads
+        priority, payload = priorities[idx], payloads[idx]
+        while idx > 0:
+            parent = (idx - 1) // 2
+            if not priority < priorities[parent]:
+                break
+            priorities[idx] = priorities[parent]
+            payloads[idx] = payloads[parent]
+            idx = parent
+        priorities[idx] = priority
+        payloads[idx] = payload
+
+    def push(self, priority, payload):
+        """
+        Insert a priority with its int payload. The bubble-up is inlined here
+        because a call per push is a large share of the cost in this hot path.
+        A priority or payload the arrays reject leaves the heap unchanged.
+        """
+        priorities, payloads = self._priorities, self._payloads
+        idx = len(priorities)
+        payloads.append(payload)
+        try:
+            priorities.append(priority)
+        except (TypeError, OverflowError):
+            payloads.pop()
+            raise
+        while idx > 0:
+            parent = (idx - 1) // 2
+            parent_priority = priorities[parent]
+            if not priority < parent_priority:
+                break
+            priorities[idx] = parent_priority
+            payloads[idx] = payloads[parent]
+            idx = parent
+        priorities[idx] = priority
+        payloads[idx] = payload
+
+    def push_many(self, priorities, payloads):
+        """
+        Insert a batch of priorities and payloads (iterables or buffers). The
+        arrays are extended in C; large batches are then merged with one
+        heapify, small ones bubbled up entry by entry (see MinHeap.push_many).
+        """
+        priorities = self._as_array("d", priorities)
+        payloads = self._as_array("q", payloads)
+        if len(priorities) != len(payloads):
+            raise ValueError("Priorities and payloads must have the same length")
+        start = len(self._priorities)
+        self._priorities.extend(priorities)
+        self._payloads.extend(payloads)
+        total = len(self._priorities)
+        if len(priorities) * total.bit_length() > 2 * total:
+            self._heapify()
+        else:
+            for idx in range(start, total):
+                self._bubble_up(idx)
+
+    def pop(self):
+        """Remove and return (priority, payload) with the smallest priority."""
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        priority, payload = self._priorities.pop(), self._payloads.pop()
+        if not self._priorities:
+            return priority, payload
+        top = self._priorities[0], self._payloads[0]
+        self._priorities[0], self._payloads[0] = priority, payload
+        self._sift_down(0)
+        return top
+
+    def peek(self):
+        """Return (priority, payload) with the smallest priority."""
+        if self.is_empty():
+            raise IndexError("Heap is empty")
+        return self._priorities[0], self._payloads[0]
+
+    @property
+    def nbytes(self):
+        """Bytes used by the stored entries (excluding array over-allocation)."""
+        return len(self._priorities) * (
+            self._priorities.itemsize + self._payloads.itemsize
+        )
+
+    def __len__(self):
+        """Return number of items in the heap."""
+        return len(self._priorities)
+
+    def is_empty(self):
+        """Return True when the heap has no items."""
+        return len(self._priorities) == 0
@@ -0,0 +1,188 @@
+import argparse
+import random
+import time
+import tracemalloc
+from array import array
+
+from answer import Heap, MaxHeap, MinHeap, NumericHeap
+
+
+def _best_of(repeat: int, setup, run) -> float:
+    # Fastest of `repeat` runs, each on a fresh object from setup().
+    best = float("inf")
+    for _ in range(repeat):
+        target = setup()
+        start = time.perf_counter()
+        run(target)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_bulk(args):
+    rng = random.Random(0)
+    print(
+        f"{'heap':>9} {'batch':>9} {'push loop':>10} {'push_many':>10} {'speedup':>8}"
+    )
+    for size in args.sizes:
+        base = [rng.random() for _ in range(size)]
+        for batch_size in args.batches:
+            batch = [rng.random() for _ in range(batch_size)]
+
+            def push_loop(heap, batch=batch):
+                for value in batch:
+                    heap.push(value)
+
+            def push_many(heap, batch=batch):
+                heap.push_many(batch)
+
+            loop = _best_of(args.repeat, lambda base=base: MinHeap(base), push_loop)
+            bulk = _best_of(args.repeat, lambda base=base: MinHeap(base), push_many)
+            print(
+                f"{size:>9} {batch_size:>9} {loop * 1e3:>8.1f}ms "
+                f"{bulk * 1e3:>8.1f}ms {loop / bulk:>7.1f}x"
+            )
+
+    # Single-sift operations against the pop/push pairs they replace.
+    size = max(args.sizes)
+    base = [rng.random() for _ in range(size)]
+    values = [rng.random() for _ in range(args.ops)]
+
+    def pop_then_push(heap):
+        for value in values:
+            heap.pop()
+            heap.push(value)
+
+    def replace(heap):
+        for value in values:
+            heap.replace(value)
+
+    def push_then_pop(heap):
+        for value in values:
+            heap.push(value)
+            heap.pop()
+
+    def pushpop(heap):
+        for value in values:
+            heap.pushpop(value)
+
+    print(f"\n{'operation':>14} {'ns/op':>8}  (heap of {size}, {args.ops} ops)")
+    for name, run in (
+        ("pop + push", pop_then_push),
+        ("replace", replace),
+        ("push + pop", push_then_pop),
+        ("pushpop", pushpop),
+    ):
+        elapsed = _best_of(args.repeat, lambda: MinHeap(base), run)
+        print(f"{name:>14} {elapsed / args.ops * 1e9:>8.0f}")
+
+
+def bench_push(args):
+    # Per-push cost with and without the comparability check, for heaps that
+    # start at each size. Small heaps are where the check's two extra
+    # comparisons are the largest share of the work.
+    rng = random.Random(0)
+    values = [rng.random() for _ in range(args.ops)]
+    print(f"{'class':>8} {'size':>9} {'checked':>9} {'trusted':>9} {'saved':>6}")
+    for cls in (MinHeap, MaxHeap, Heap):
+        for size in args.sizes:
+            base = [rng.random() for _ in range(size)]
+
+            def push_all(heap):
+                push = heap.push
+                for value in values:
+                    push(value)
+
+            timings = []
+            for validate in (True, False):
+
+                def build(cls=cls, base=base, validate=validate):
+                    return cls(base, validate=validate)
+
+                elapsed = _best_of(args.repeat, build, push_all)
+                timings.append(elapsed / args.ops * 1e9)
+            checked, trusted = timings
+            print(
+                f"{cls.__name__:>8} {size:>9} {checked:>7.0f}ns {trusted:>7.0f}ns "
+                f"{1 - trusted / checked:>6.0%}"
+            )
+
+
+def _traced(build):
+    # (result, bytes allocated while building it, seconds taken). Timed on a
+    # separate untraced build, since tracing slows every allocation down.
+    tracemalloc.start()
+    traced = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traced
+    start = time.perf_counter()
+    result = build()
+    return result, size, time.perf_counter() - start
+
+
+def bench_numeric(args):
+    # MinHeap of (priority, payload) tuples vs NumericHeap's unboxed arrays.
+    rng = random.Random(0)
+    priorities = array("d", (rng.random() for _ in range(args.entries)))
+    extra = [rng.random() for _ in range(args.ops)]
+
+    tuples, tuple_bytes, tuple_heapify = _traced(
+        lambda: MinHeap(zip(priorities, range(args.entries)))
+    )
+    numeric, numeric_bytes, numeric_heapify = _traced(lambda: NumericHeap(priorities))
+
+    def run(push, pop):
+        start = time.perf_counter()
+        for payload, priority in enumerate(extra):
+            push(priority, payload)
+        pushed = time.perf_counter()
+        for _ in extra:
+            pop()
+        return pushed - start, time.perf_counter() - pushed
+
+    tuple_push, tuple_pop = run(lambda p, v: tuples.push((p, v)), tuples.pop)
+    numeric_push, numeric_pop = run(numeric.push, numeric.pop)
+
+    n = args.entries
+    print(f"{n} entries, {args.ops} pushes then pops")
+    print(f"{'':>14} {'bytes/entry':>12} {'heapify':>9} {'push ns':>8} {'pop ns':>8}")
+    for name, size, heapify, push, pop in (
+        ("MinHeap+tuple", tuple_bytes, tuple_heapify, tuple_push, tuple_pop),
+        ("NumericHeap", numeric_bytes, numeric_heapify, numeric_push, numeric_pop),
+    ):
+        print(
+            f"{name:>14} {size / n:>12.1f} {heapify:>8.2f}s "
+            f"{push / args.ops * 1e9:>8.0f} {pop / args.ops * 1e9:>8.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Heap benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    bulk = sub.add_parser("bulk", help="push_many/pushpop/replace vs single ops")
+    bulk.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000])
+    bulk.add_argument(
+        "--batches", type=int, nargs="+", default=[100, 10_000, 1_000_000]
+    )
+    bulk.add_argument("--ops", type=int, default=100_000)
+    bulk.add_argument("--repeat", type=int, default=3)
+    bulk.set_defaults(func=bench_bulk)
+
+    push = sub.add_parser("push", help="per-push cost, validate=True vs False")
+    push.add_argument("--sizes", type=int, nargs="+", default=[0, 100, 100_000])
+    push.add_argument("--ops", type=int, default=100_000)
+    push.add_argument("--repeat", type=int, default=5)
+    push.set_defaults(func=bench_push)
+
+    numeric = sub.add_parser("numeric", help="NumericHeap vs MinHeap of tuples")
+    numeric.add_argument("--entries", type=int, default=1_000_000)
+    numeric.add_argument("--ops", type=int, default=100_000)
+    numeric.set_defaults(func=bench_numeric)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 class MinHeap:
-    def __init__(self, values=None):
+    def __init__(self, values=None, validate=True):
         raise NotImplementedError
 
     def push(self, value):
@@ -8,6 +8,18 @@ class MinHeap:
     def pop(self):
         raise NotImplementedError
 
+    def push_many(self, values):
+        raise NotImplementedError
+
+    def pop_many(self, k):
+        raise NotImplementedError
+
+    def pushpop(self, value):
+        raise NotImplementedError
+
+    def replace(self, value):
+        raise NotImplementedError
+
     def peek(self):
         raise NotImplementedError
 
@@ -19,7 +31,39 @@ class MinHeap:
 
 
 class MaxHeap:
-    def __init__(self, values=None):
+    def __init__(self, values=None, validate=True):
+        raise NotImplementedError
+
+    def push(self, value):
+        raise NotImplementedError
+
+    def pop(self):
+        raise NotImplementedError
+
+    def push_many(self, values):
+        raise NotImplementedError
+
+    def pop_many(self, k):
+        raise NotImplementedError
+
+    def pushpop(self, value):
+        raise NotImplementedError
+
+    def replace(self, value):
+        raise NotImplementedError
+
+    def peek(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def is_empty(self):
+        raise NotImplementedError
+
+
+class Heap:
+    def __init__(self, values=None, key=None, reverse=False, validate=True):
         raise NotImplementedError
 
     def push(self, value):
@@ -36,3 +80,81 @@ class MaxHeap:
 
     def is_empty(self):
         raise NotImplementedError
+
+
+class IndexedPriorityQueue(MinHeap):
+    def __init__(self, items=None):
+        raise NotImplementedError
+
+    def push(self, handle, priority):
+        raise NotImplementedError
+
+    def pop(self):
+        raise NotImplementedError
+
+    def peek(self):
+        raise NotImplementedError
+
+    def push_many(self, items):
+        raise NotImplementedError
+
+    def pushpop(self, handle, priority):
+        raise NotImplementedError
+
+    def replace(self, handle, priority):
+        raise NotImplementedError
+
+    def update_priority(self, handle, priority):
+        raise NotImplementedError
+
+    def remove(self, handle):
+        raise NotImplementedError
+
+    def priority(self, handle):
+        raise NotImplementedError
+
+    def __contains__(self, handle):
+        raise NotImplementedError
+
+
+class TopK:
+    def __init__(self, k, key=None):
+        raise NotImplementedError
+
+    def push(self, item):
+        raise NotImplementedError
+
+    def push_many(self, items):
+        raise NotImplementedError
+
+    def merge(self, other):
+        raise NotImplementedError
+
+    def top(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class NumericHeap:
+    def __init__(self, priorities=None, payloads=None):
+        raise NotImplementedError
+
+    def push(self, priority, payload):
+        raise NotImplementedError
+
+    def push_many(self, priorities, payloads):
+        raise NotImplementedError
+
+    def pop(self):
+        raise NotImplementedError
+
+    def peek(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def is_empty(self):
+        raise NotImplementedError
@@ -1,6 +1,16 @@
+import random
+from array import array
+
 import pytest
 
-from main import MaxHeap, MinHeap
+from main import (
+    Heap,
+    IndexedPriorityQueue,
+    MaxHeap,
+    MinHeap,
+    NumericHeap,
+    TopK,
+)
 
 
 def drain(heap):
@@ -87,10 +97,365 @@ def test_length_and_is_empty_track_state():
     assert len(heap) == 0
 
 
-@pytest.mark.parametrize("HeapClass", [MinHeap, MaxHeap])
+@pytest.mark.parametrize("HeapClass", [MinHeap, MaxHeap, Heap])
 def test_pop_and_peek_on_empty_raise(HeapClass):
     heap = HeapClass()
     with pytest.raises(IndexError):
         heap.pop()
     with pytest.raises(IndexError):
         heap.peek()
+
+
+def test_indexed_queue_pops_by_priority_then_insertion_order():
+    queue = IndexedPriorityQueue({"a": 3, "b": 1})
+    queue.push("c", 3)
+    queue.push("d", 2)
+
+    assert len(queue) == 4
+    assert queue.peek() == ("b", 1)
+    assert drain(queue) == [("b", 1), ("d", 2), ("a", 3), ("c", 3)]
+
+
+def test_indexed_queue_update_priority_moves_both_ways():
+    queue = IndexedPriorityQueue([("a", 5), ("b", 6), ("c", 7)])
+    queue.update_priority("c", 1)
+    assert queue.peek() == ("c", 1)
+    queue.update_priority("c", 10)
+    assert queue.priority("c") == 10
+    assert drain(queue) == [("a", 5), ("b", 6), ("c", 10)]
+
+
+def test_indexed_queue_remove_arbitrary_handle():
+    queue = IndexedPriorityQueue()
+    for handle, priority in [("a", 4), ("b", 2), ("c", 9), ("d", 1), ("e", 7)]:
+        queue.push(handle, priority)
+
+    assert queue.remove("b") == 2
+    assert "b" not in queue
+    assert queue.remove("e") == 7
+    assert drain(queue) == [("d", 1), ("a", 4), ("c", 9)]
+
+
+def test_indexed_queue_rejects_duplicates_and_unknown_handles():
+    queue = IndexedPriorityQueue({"a": 1})
+    with pytest.raises(ValueError):
+        queue.push("a", 2)
+    with pytest.raises(KeyError):
+        queue.update_priority("missing", 1)
+    with pytest.raises(KeyError):
+        queue.remove("missing")
+
+
+def test_indexed_queue_matches_sorted_order_after_random_operations():
+    rng = random.Random(7)
+    queue = IndexedPriorityQueue()
+    expected = {}
+    for _ in range(500):
+        handle = rng.randrange(60)
+        action = rng.random()
+        if handle not in expected:
+            priority = rng.randrange(100)
+            queue.push(handle, priority)
+            expected[handle] = priority
+        elif action < 0.5:
+            priority = rng.randrange(100)
+            queue.update_priority(handle, priority)
+            expected[handle] = priority
+        else:
+            assert queue.remove(handle) == expected.pop(handle)
+
+    popped = drain(queue)
+    assert sorted(priority for _, priority in popped) == [
+        priority for _, priority in popped
+    ]
+    assert dict(popped) == expected
+
+
+def test_heap_orders_like_min_and_max_heap():
+    values = [5, 3, 8, 1, 3, -2]
+    assert drain(Heap(values)) == sorted(values)
+    assert drain(Heap(values, reverse=True)) == sorted(values, reverse=True)
+
+
+def test_heap_key_is_computed_once_per_value():
+    calls = []
+
+    def key(word):
+        calls.append(word)
+        return len(word)
+
+    heap = Heap(["ccc", "a"], key=key)
+    heap.push("bb")
+    heap.push("dddd")
+    assert drain(heap) == ["a", "bb", "ccc", "dddd"]
+    assert sorted(calls) == ["a", "bb", "ccc", "dddd"]
+
+
+def test_heap_breaks_ties_by_insertion_order():
+    tasks = [("b", 1), ("a", 2), ("c", 1), ("d", 2), ("e", 1)]
+    heap = Heap(tasks[:2], key=lambda task: task[1])
+    for task in tasks[2:]:
+        heap.push(task)
+    assert [name for name, _ in drain(heap)] == ["b", "c", "e", "a", "d"]
+
+    heap = Heap(tasks, key=lambda task: task[1], reverse=True)
+    assert [name for name, _ in drain(heap)] == ["a", "d", "b", "c", "e"]
+
+
+def test_heap_never_compares_values_with_equal_keys():
+    class Opaque:
+        pass
+
+    items = [Opaque() for _ in range(6)]
+    heap = Heap(key=lambda item: 0)
+    for item in items:
+        heap.push(item)
+    assert drain(heap) == items
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_heap_matches_stable_reference_under_random_operations(reverse):
+    rng = random.Random(3)
+    heap = Heap(key=lambda value: value % 17, reverse=reverse)
+    reference = []
+    for seq in range(600):
+        if reference and rng.random() < 0.4:
+            best = min(reference, key=lambda e: (-e[0] if reverse else e[0], e[1]))
+            reference.remove(best)
+            assert heap.pop() == best[2]
+        else:
+            value = rng.randrange(1000)
+            heap.push(value)
+            reference.append((value % 17, seq, value))
+    assert len(heap) == len(reference)
+
+
+def test_heap_rejects_incomparable_keys():
+    heap = Heap([1, 2])
+    with pytest.raises(TypeError):
+        heap.push("x")
+    with pytest.raises(TypeError):
+        Heap([1, "x", 2])
+
+
+@pytest.mark.parametrize("batch", [3, 500])
+def test_push_many_small_and_large_batches(batch):
+    rng = random.Random(batch)
+    values = [rng.randrange(1000) for _ in range(batch)]
+    min_heap = MinHeap([50, 20, 70])
+    max_heap = MaxHeap([50, 20, 70])
+    min_heap.push_many(values)
+    max_heap.push_many(iter(values))
+
+    assert drain(min_heap) == sorted(values + [50, 20, 70])
+    assert drain(max_heap) == sorted(values + [50, 20, 70], reverse=True)
+
+
+def test_push_many_rejects_incomparable_batch_without_changing_heap():
+    heap = MinHeap([3, 1, 2])
+    with pytest.raises(TypeError):
+        heap.push_many([4, "x"] * 10)
+    assert drain(heap) == [1, 2, 3]
+
+
+def test_pop_many_returns_items_in_order():
+    min_heap = MinHeap([5, 1, 4, 2, 3])
+    max_heap = MaxHeap([5, 1, 4, 2, 3])
+    assert min_heap.pop_many(3) == [1, 2, 3]
+    assert max_heap.pop_many(2) == [5, 4]
+    assert min_heap.pop_many(0) == []
+    with pytest.raises(IndexError):
+        min_heap.pop_many(3)
+    assert len(min_heap) == 2
+
+
+def test_pushpop_returns_new_value_when_it_would_be_first():
+    heap = MinHeap([5, 7])
+    assert heap.pushpop(1) == 1
+    assert heap.pushpop(6) == 5
+    assert drain(heap) == [6, 7]
+    assert MinHeap().pushpop(3) == 3
+
+    max_heap = MaxHeap([5, 7])
+    assert max_heap.pushpop(9) == 9
+    assert max_heap.pushpop(6) == 7
+    assert drain(max_heap) == [6, 5]
+
+
+def test_replace_pops_before_pushing():
+    heap = MinHeap([5, 7])
+    assert heap.replace(1) == 5
+    assert drain(heap) == [1, 7]
+    max_heap = MaxHeap([5, 7])
+    assert max_heap.replace(9) == 7
+    assert drain(max_heap) == [9, 5]
+    with pytest.raises(IndexError):
+        MinHeap().replace(1)
+
+
+def test_indexed_queue_bulk_operations_keep_positions():
+    queue = IndexedPriorityQueue()
+    queue.push_many([("a", 5), ("b", 3), ("c", 8)])
+    assert queue.pushpop("d", 1) == ("d", 1)
+    assert "d" not in queue
+    assert queue.pushpop("e", 4) == ("b", 3)
+    assert queue.replace("f", 9) == ("e", 4)
+    queue.update_priority("f", 0)
+    assert queue.pop_many(3) == [("f", 0), ("a", 5), ("c", 8)]
+
+
+def test_top_k_keeps_largest_items():
+    rng = random.Random(11)
+    values = [rng.randrange(10_000) for _ in range(2_000)]
+    top = TopK(10)
+    top.push_many(values)
+    assert len(top) == 10
+    assert top.top() == sorted(values, reverse=True)[:10]
+
+
+def test_top_k_rejects_items_below_cut_off():
+    top = TopK(2)
+    assert top.push(5) is True
+    assert top.push(3) is True
+    assert top.push(1) is False
+    assert top.push(3) is False
+    assert top.push(8) is True
+    assert top.top() == [8, 5]
+
+
+def test_top_k_with_key_keeps_earlier_item_on_ties():
+    records = [("a", 3), ("b", 9), ("c", 3), ("d", 7), ("e", 9)]
+    top = TopK(3, key=lambda record: record[1])
+    top.push_many(records)
+    assert top.top() == [("b", 9), ("e", 9), ("d", 7)]
+
+
+def test_top_k_with_key_keeps_earlier_item_on_tie_at_cut_off():
+    top = TopK(2, key=lambda record: record[0])
+    top.push_many([(5, "a"), (5, "b"), (6, "c")])
+    assert top.top() == [(6, "c"), (5, "a")]
+    other = TopK(2, key=lambda record: record[0])
+    other.push_many([(4, "d"), (5, "e")])
+    assert top.merge(other).top() == [(6, "c"), (5, "a")]
+
+
+def test_top_k_merge_combines_partial_results():
+    rng = random.Random(5)
+    values = [rng.random() for _ in range(1_000)]
+    left, right = TopK(7, key=abs), TopK(7, key=abs)
+    left.push_many(values[:500])
+    right.push_many(values[500:])
+    assert left.merge(right) is left
+    assert left.top() == sorted(values, reverse=True)[:7]
+
+
+def test_top_k_with_zero_k():
+    top = TopK(0)
+    assert top.push(1) is False
+    assert top.top() == []
+    with pytest.raises(ValueError):
+        TopK(-1)
+
+
+@pytest.mark.parametrize("HeapClass", [MinHeap, MaxHeap, Heap])
+def test_validate_false_skips_comparability_check(HeapClass):
+    heap = HeapClass([4, 1, 3], validate=False)
+
+    def fail(value):
+        raise AssertionError("comparability check should be skipped")
+
+    heap._ensure_comparable = fail
+    heap.push(2)
+    heap.push(0)
+    assert sorted(drain(heap)) == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("HeapClass", [MinHeap, MaxHeap])
+def test_validate_false_orders_like_validated_heap(HeapClass):
+    rng = random.Random(1)
+    values = [rng.random() for _ in range(300)]
+    trusted = HeapClass(validate=False)
+    checked = HeapClass()
+    for value in values:
+        trusted.push(value)
+        checked.push(value)
+    assert trusted.pushpop(0.5) == checked.pushpop(0.5)
+    assert trusted.replace(0.25) == checked.replace(0.25)
+    assert drain(trusted) == drain(checked)
+
+
+def test_numeric_heap_pops_priorities_with_payloads():
+    heap = NumericHeap()
+    for payload, priority in enumerate([5.0, 3.5, 8.0, -1.0, 3.5]):
+        heap.push(priority, payload)
+
+    assert len(heap) == 5
+    assert heap.peek() == (-1.0, 3)
+    popped = drain(heap)
+    assert [priority for priority, _ in popped] == [-1.0, 3.5, 3.5, 5.0, 8.0]
+    assert {payload for priority, payload in popped if priority == 3.5} == {1, 4}
+
+
+def test_numeric_heap_heapifies_from_buffers():
+    rng = random.Random(2)
+    priorities = array("d", (rng.random() for _ in range(1_000)))
+    payloads = array("q", range(1_000, 2_000))
+
+    from_arrays = NumericHeap(priorities, payloads)
+    from_bytes = NumericHeap(priorities.tobytes(), payloads.tobytes())
+    default_payloads = NumericHeap(memoryview(priorities))
+
+    expected = sorted(zip(priorities, payloads))
+    assert drain(from_arrays) == expected
+    assert drain(from_bytes) == expected
+    assert drain(default_payloads) == sorted(
+        (priority, index) for index, priority in enumerate(priorities)
+    )
+    # The caller's buffer is copied, not reordered.
+    assert list(payloads) == list(range(1_000, 2_000))
+
+
+@pytest.mark.parametrize("batch", [5, 5_000])
+def test_numeric_heap_push_many(batch):
+    rng = random.Random(batch)
+    heap = NumericHeap([0.5, 0.25], [0, 1])
+    priorities = [rng.random() for _ in range(batch)]
+    heap.push_many(priorities, range(2, batch + 2))
+
+    popped = drain(heap)
+    assert [priority for priority, _ in popped] == sorted(priorities + [0.5, 0.25])
+    assert sorted(payload for _, payload in popped) == list(range(batch + 2))
+
+
+def test_numeric_heap_rejects_mismatched_lengths_and_empty_pops():
+    with pytest.raises(ValueError):
+        NumericHeap([1.0, 2.0], [1])
+    heap = NumericHeap()
+    with pytest.raises(ValueError):
+        heap.push_many([1.0], [])
+    with pytest.raises(IndexError):
+        heap.pop()
+    with pytest.raises(IndexError):
+        heap.peek()
+
+
+def test_numeric_heap_push_rejects_bad_entries_without_partial_writes():
+    heap = NumericHeap([1.0], [1])
+    with pytest.raises(TypeError):
+        heap.push(0.5, 1.5)
+    with pytest.raises(OverflowError):
+        heap.push(0.5, 2**63)
+    with pytest.raises(TypeError):
+        heap.push("low", 2)
+    assert len(heap) == 1
+    heap.push(0.5, 2)
+    assert drain(heap) == [(0.5, 2), (1.0, 1)]
+
+
+def test_numeric_heap_converts_typed_buffers_by_value():
+    heap = NumericHeap(
+        memoryview(array("f", [3, 1, 2, 4])), memoryview(array("i", [30, 10, 20, 40]))
+    )
+    assert drain(heap) == [(1.0, 10), (2.0, 20), (3.0, 30), (4.0, 40)]
+    heap.push_many(memoryview(array("d", [0.5])), memoryview(array("q", [5])))
+    assert heap.pop() == (0.5, 5)